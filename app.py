@@ -3,19 +3,29 @@ HealthClaim Analytics Hub - Main Application
 A Streamlit web app for patient claims fraud analysis with GPT integration
 """
 
+import hashlib
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from enum import IntEnum
+from io import BytesIO
 import sys
 import os
 
 # Add utils to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'utils'))
 
-from data import load_claims_data, sanitize_claims_data, filter_claims_by_parameters, get_statistics
+from data import (
+    load_claims_data,
+    read_claims_csv,
+    sanitize_claims_data,
+    filter_claims_by_parameters,
+    get_statistics
+)
 from network import (
+    LARGE_LAYOUT_NODES,
     build_patient_provider_network,
+    compute_network_layout,
     create_network_visualization,
     get_network_statistics,
     detect_suspicious_clusters
@@ -30,7 +40,9 @@ from anomaly import (
 )
 from gpt import (
     initialize_openai,
-    generate_anomaly_explanation,
+    generate_anomaly_explanations,
+    submit_anomaly_batch,
+    retrieve_anomaly_batch,
     generate_network_insights,
     answer_claims_question,
     validate_api_connection
@@ -44,27 +56,127 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Apply custom styling
-st.markdown("""
-    <style>
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 20px;
-        border-radius: 10px;
-        margin: 10px 0;
-    }
-    .anomaly-high {
-        background-color: #ffcccc;
-        padding: 10px;
-        border-radius: 5px;
-    }
-    .anomaly-medium {
-        background-color: #fff4cc;
-        padding: 10px;
-        border-radius: 5px;
-    }
-    </style>
-""", unsafe_allow_html=True)
+@st.cache_resource(show_spinner=False)
+def load_app_css() -> str:
+    """Read static/app.css once per server process, wrapped in a style tag."""
+    css_path = os.path.join(os.path.dirname(__file__), 'static', 'app.css')
+    with open(css_path, encoding='utf-8') as css_file:
+        return f"<style>{css_file.read()}</style>"
+
+
+# Apply custom styling. This has to be emitted on every rerun: Streamlit
+# clears elements a rerun does not re-create, so a once-per-session
+# sentinel would drop the styles after the first interaction.
+st.markdown(load_app_css(), unsafe_allow_html=True)
+
+# ==================== CACHED COMPUTATIONS ====================
+# Streamlit reruns the whole script on every widget interaction, so the
+# expensive, data-dependent steps are cached on a cheap fingerprint of the
+# claims frame instead of Streamlit's default deep hash.
+
+def _frame_fingerprint(df: pd.DataFrame) -> tuple:
+    """
+    Return a cheap cache key for a DataFrame.
+    
+    The per-row hashes are digested in order, so reordered rows get a new
+    key, and column names and dtypes are part of the key too.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return (
+        tuple(df.columns),
+        tuple(map(str, df.dtypes)),
+        hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest(),
+    )
+
+
+FRAME_HASH_FUNCS = {pd.DataFrame: _frame_fingerprint}
+
+
+@st.cache_data(show_spinner=False)
+def load_uploaded_claims(file_bytes: bytes) -> pd.DataFrame:
+    """Parse and sanitize an uploaded CSV once per distinct file."""
+    return sanitize_claims_data(read_claims_csv(BytesIO(file_bytes)))
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def cached_statistics(df: pd.DataFrame) -> dict:
+    """Summary statistics for the claims currently on display."""
+    return get_statistics(df)
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=4)
+def frame_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """CSV export of a frame, serialised once rather than on every rerun."""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+# Columns build_patient_provider_network reads
+NETWORK_COLUMNS = ['patient_id', 'provider_id', 'claim_amount']
+
+
+@st.cache_resource(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=4)
+def cached_network_analysis(df: pd.DataFrame) -> tuple:
+    """
+    Build the patient-provider graph and its derived statistics.
+    
+    Uses cache_resource so the (large, mutable) NetworkX graph is shared
+    between reruns instead of being pickled and copied by cache_data.
+    """
+    network = build_patient_provider_network(df)
+    return network, get_network_statistics(network), detect_suspicious_clusters(network)
+
+
+@st.cache_resource(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS, max_entries=4)
+def cached_network_layout(df: pd.DataFrame) -> dict:
+    """Node positions for the network plot, computed once per claims frame."""
+    network, _, _ = cached_network_analysis(df)
+    # igraph's C layout for big graphs; networkx if igraph isn't installed
+    engine = 'igraph' if network.number_of_nodes() > LARGE_LAYOUT_NODES else 'networkx'
+    return compute_network_layout(network, engine=engine)
+
+
+# ==================== ANOMALY DETECTION METHODS ====================
+class AnomalyMethod(IntEnum):
+    THRESHOLD = 0
+    STATISTICAL = 1
+    ISOLATION_FOREST = 2
+
+
+ANOMALY_METHOD_LABELS = {
+    AnomalyMethod.THRESHOLD: "Threshold",
+    AnomalyMethod.STATISTICAL: "Statistical (Z-Score)",
+    AnomalyMethod.ISOLATION_FOREST: "Machine Learning (Isolation Forest)",
+}
+
+# Sidebar slider for each method's tuning parameter
+ANOMALY_PARAM_SLIDERS = {
+    AnomalyMethod.THRESHOLD: dict(
+        label="Claim Amount Threshold", min_value=100, max_value=5000, value=1000, step=50
+    ),
+    AnomalyMethod.STATISTICAL: dict(
+        label="Z-Score Threshold", min_value=1.0, max_value=5.0, value=3.0, step=0.5
+    ),
+    AnomalyMethod.ISOLATION_FOREST: dict(
+        label="Expected Anomaly Rate (%)", min_value=1, max_value=20, value=5
+    ),
+}
+
+# Detector and a builder for its keyword arguments from the slider value
+ANOMALY_DETECTORS = {
+    AnomalyMethod.THRESHOLD: (
+        detect_anomalies_threshold,
+        lambda param: {'column': 'claim_amount', 'threshold': param}
+    ),
+    AnomalyMethod.STATISTICAL: (
+        detect_anomalies_statistical,
+        lambda param: {'column': 'claim_amount', 'z_threshold': param}
+    ),
+    AnomalyMethod.ISOLATION_FOREST: (
+        detect_anomalies_isolation_forest,
+        lambda param: {'contamination': param / 100}
+    ),
+}
+
 
 # ==================== SESSION STATE INITIALIZATION ====================
 if 'claims_data' not in st.session_state:
@@ -73,12 +185,30 @@ if 'claims_data' not in st.session_state:
 if 'filtered_data' not in st.session_state:
     st.session_state.filtered_data = None
 
+if 'filter_inputs' not in st.session_state:
+    st.session_state.filter_inputs = None
+
 if 'anomalies' not in st.session_state:
     st.session_state.anomalies = None
 
 if 'gpt_initialized' not in st.session_state:
     st.session_state.gpt_initialized = False
 
+if 'batch_id' not in st.session_state:
+    st.session_state.batch_id = None
+
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
+
+if 'batch_labels' not in st.session_state:
+    st.session_state.batch_labels = {}
+
+if 'batch_poll_failures' not in st.session_state:
+    st.session_state.batch_poll_failures = 0
+
+# Consecutive failed polls after which a pending batch is dropped
+MAX_BATCH_POLL_FAILURES = 3
+
 # ==================== MAIN HEADER ====================
 st.title("🏥 HealthClaim Analytics Hub")
 st.markdown("AI-Powered Patient Claims Fraud Detection & Network Analysis")
@@ -104,9 +234,8 @@ with st.sidebar:
             uploaded_file = st.file_uploader("Upload CSV file", type=['csv'])
             if uploaded_file:
                 try:
-                    df = pd.read_csv(uploaded_file)
                     # Sanitize uploaded data to ensure proper formatting
-                    df = sanitize_claims_data(df)
+                    df = load_uploaded_claims(uploaded_file.getvalue())
                     st.session_state.claims_data = df
                     st.success("✅ File uploaded successfully!")
                 except Exception as e:
@@ -143,47 +272,35 @@ with st.sidebar:
                     value=float(st.session_state.claims_data['claim_amount'].max())
                 )
             
-            # Apply filters
-            st.session_state.filtered_data = filter_claims_by_parameters(
-                st.session_state.claims_data,
-                min_amount=min_amount,
-                max_amount=max_amount
-            )
+            # Apply filters only when the data or the bounds changed, so an
+            # unrelated rerun does not re-slice the whole claims frame
+            last_inputs = st.session_state.filter_inputs
+            if (
+                last_inputs is None
+                or last_inputs[0] is not st.session_state.claims_data
+                or last_inputs[1:] != (min_amount, max_amount)
+            ):
+                st.session_state.filtered_data = filter_claims_by_parameters(
+                    st.session_state.claims_data,
+                    min_amount=min_amount,
+                    max_amount=max_amount
+                )
+                st.session_state.filter_inputs = (st.session_state.claims_data, min_amount, max_amount)
     
     st.divider()
     
     # Anomaly detection settings
     st.subheader("🚨 Anomaly Detection")
     
-    anomaly_method = st.radio(
+    anomaly_method = AnomalyMethod(st.radio(
         "Detection Method:",
-        ["Threshold", "Statistical (Z-Score)", "Machine Learning (Isolation Forest)"],
+        list(AnomalyMethod),
+        format_func=lambda method: ANOMALY_METHOD_LABELS[AnomalyMethod(method)],
         key="anomaly_method"
-    )
+    ))
+    anomaly_method_label = ANOMALY_METHOD_LABELS[anomaly_method]
     
-    if anomaly_method == "Threshold":
-        anomaly_param = st.slider(
-            "Claim Amount Threshold",
-            min_value=100,
-            max_value=5000,
-            value=1000,
-            step=50
-        )
-    elif anomaly_method == "Statistical (Z-Score)":
-        anomaly_param = st.slider(
-            "Z-Score Threshold",
-            min_value=1.0,
-            max_value=5.0,
-            value=3.0,
-            step=0.5
-        )
-    else:
-        anomaly_param = st.slider(
-            "Expected Anomaly Rate (%)",
-            min_value=1,
-            max_value=20,
-            value=5
-        )
+    anomaly_param = st.slider(**ANOMALY_PARAM_SLIDERS[anomaly_method])
     
     st.divider()
     
@@ -236,7 +353,7 @@ else:
     
     col1, col2, col3, col4 = st.columns(4)
     
-    stats = get_statistics(display_data)
+    stats = cached_statistics(display_data)
     
     with col1:
         st.metric("Total Claims", f"{stats.get('total_claims', 0):,}")
@@ -255,17 +372,20 @@ else:
     # ========== NETWORK ANALYSIS ==========
     st.header("🕸️ Patient-Provider Network Analysis")
     
+    # The graph only needs these columns; narrowing first also keeps the
+    # cache fingerprint from hashing every text column on each rerun
+    network_data = display_data[NETWORK_COLUMNS]
+    
     with st.spinner("Building network..."):
-        network = build_patient_provider_network(display_data)
-        net_stats = get_network_statistics(network)
-        suspicious_clusters = detect_suspicious_clusters(network)
+        network, net_stats, suspicious_clusters = cached_network_analysis(network_data)
     
     # Display network
     st.subheader("Network Visualization")
     
     fig = create_network_visualization(
         network,
-        title=f"Patient-Provider Network ({net_stats['num_nodes']} nodes, {net_stats['num_edges']} connections)"
+        title=f"Patient-Provider Network ({net_stats['num_nodes']} nodes, {net_stats['num_edges']} connections)",
+        pos=cached_network_layout(network_data)
     )
     st.plotly_chart(fig, use_container_width=True)
     
@@ -297,23 +417,8 @@ else:
     else:
         with st.spinner("Detecting anomalies..."):
             # Apply selected anomaly detection method
-            if anomaly_method == "Threshold":
-                anomalies = detect_anomalies_threshold(
-                    display_data,
-                    column='claim_amount',
-                    threshold=anomaly_param
-                )
-            elif anomaly_method == "Statistical (Z-Score)":
-                anomalies = detect_anomalies_statistical(
-                    display_data,
-                    column='claim_amount',
-                    z_threshold=anomaly_param
-                )
-            else:
-                anomalies = detect_anomalies_isolation_forest(
-                    display_data,
-                    contamination=anomaly_param / 100
-                )
+            detector, detector_kwargs = ANOMALY_DETECTORS[anomaly_method]
+            anomalies = detector(display_data, **detector_kwargs(anomaly_param))
             
             st.session_state.anomalies = anomalies
         
@@ -360,27 +465,98 @@ else:
             tab1, tab2, tab3 = st.tabs(["Anomaly Explanation", "Network Insights", "Ask Question"])
             
             with tab1:
-                st.subheader("GPT Analysis of Top Anomaly")
+                st.subheader("GPT Analysis of Top Anomalies")
+                
+                context = f"Dataset context: {anomaly_summary['total_claims']} total claims analyzed. "
+                context += f"Anomaly detection method: {anomaly_method_label}"
                 
-                if st.button("Generate Explanation", key="explain_anomaly"):
+                if st.button("Generate Explanations", key="explain_anomaly"):
                     if not top_anomalies.empty:
-                        with st.spinner("Generating explanation..."):
-                            top_anomaly = top_anomalies.iloc[0]
+                        with st.spinner("Generating explanations..."):
+                            claim_rows = [row for _, row in top_anomalies.head(5).iterrows()]
                             
-                            context = f"Dataset context: {anomaly_summary['total_claims']} total claims analyzed. "
-                            context += f"Anomaly detection method: {anomaly_method}"
-                            
-                            explanation = generate_anomaly_explanation(
-                                top_anomaly,
+                            # Requests run concurrently; latency is bounded by the slowest one
+                            explanations = generate_anomaly_explanations(
+                                claim_rows,
                                 context=context,
                                 model=gpt_model
                             )
-                            
+                        
+                        for rank, (claim_row, explanation) in enumerate(zip(claim_rows, explanations), 1):
                             if explanation:
-                                st.markdown("### 📋 Analysis Result")
+                                st.markdown(f"### 📋 Anomaly #{rank} (Patient {claim_row.get('patient_id', 'N/A')})")
                                 st.write(explanation)
                     else:
                         st.info("No anomalies to explain")
+                
+                # Bulk explanations via the Batch API (half price, up to 24h turnaround)
+                st.divider()
+                flagged_claims = anomalies[anomalies['is_anomaly']]
+                st.caption("Explain every flagged claim at half the cost. Results can take up to 24 hours.")
+                
+                if st.button(f"Queue Batch Explanations ({len(flagged_claims)} claims)", key="queue_batch"):
+                    if not flagged_claims.empty:
+                        with st.spinner("Submitting batch..."):
+                            batch_id = submit_anomaly_batch(flagged_claims, context=context, model=gpt_model)
+                        if batch_id:
+                            st.session_state.batch_id = batch_id
+                            st.session_state.batch_results = None
+                            st.session_state.batch_poll_failures = 0
+                            # Results come back keyed by frame index, which means
+                            # nothing once the data is reloaded or re-filtered
+                            st.session_state.batch_labels = {
+                                str(idx): f"Patient {patient} / Provider {provider}"
+                                for idx, patient, provider in zip(
+                                    flagged_claims.index,
+                                    flagged_claims['patient_id'],
+                                    flagged_claims['provider_id']
+                                )
+                            }
+                    else:
+                        st.info("No anomalies to explain")
+                
+                if st.session_state.batch_id or st.session_state.batch_results is not None:
+                    if st.button("Clear batch", key="clear_batch"):
+                        st.session_state.batch_id = None
+                        st.session_state.batch_results = None
+                        st.session_state.batch_labels = {}
+                        st.session_state.batch_poll_failures = 0
+                
+                # Poll the pending batch on rerun until it reaches a final state
+                if st.session_state.batch_id and st.session_state.batch_results is None:
+                    batch = retrieve_anomaly_batch(st.session_state.batch_id)
+                    if batch is None:
+                        # The error itself was already shown by retrieve_anomaly_batch
+                        st.session_state.batch_poll_failures += 1
+                        if st.session_state.batch_poll_failures >= MAX_BATCH_POLL_FAILURES:
+                            st.error(
+                                f"❌ Stopped checking batch {st.session_state.batch_id} after "
+                                f"{MAX_BATCH_POLL_FAILURES} failed attempts. Queue it again to retry."
+                            )
+                            st.session_state.batch_id = None
+                    elif batch['status'] == 'completed':
+                        st.session_state.batch_poll_failures = 0
+                        st.session_state.batch_results = batch
+                    elif batch['status'] in ('failed', 'expired', 'cancelled'):
+                        st.error(f"❌ Batch {st.session_state.batch_id} {batch['status']}")
+                        st.session_state.batch_id = None
+                    else:
+                        st.session_state.batch_poll_failures = 0
+                        st.info(f"⏳ Batch {st.session_state.batch_id} is {batch['status']}. Results will appear here once it completes.")
+                
+                batch_results = st.session_state.batch_results
+                if batch_results is not None:
+                    explanations = batch_results['explanations']
+                    if batch_results['failed']:
+                        st.warning(f"⚠️ {len(batch_results['failed'])} claims in the batch failed and have no explanation.")
+                    if explanations:
+                        with st.expander(f"Batch Explanations ({len(explanations)} claims)"):
+                            for claim_id, explanation in explanations.items():
+                                label = st.session_state.batch_labels.get(claim_id, f"Claim #{claim_id}")
+                                st.markdown(f"**{label}**")
+                                st.write(explanation)
+                    elif not batch_results['failed']:
+                        st.info("Batch completed without returning any explanations.")
             
             with tab2:
                 st.subheader("GPT Analysis of Network Patterns")
@@ -417,7 +593,7 @@ Current Dataset:
 - Unique Patients: {stats['unique_patients']}
 - Unique Providers: {stats['unique_providers']}
 - Anomalies Detected: {anomaly_summary['anomalies_detected']}
-- Detection Method: {anomaly_method}
+- Detection Method: {anomaly_method_label}
 """
                             
                             answer = answer_claims_question(
@@ -442,27 +618,26 @@ Current Dataset:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("Download Anomalies CSV", use_container_width=True):
-            if st.session_state.anomalies is not None and not st.session_state.anomalies.empty:
-                csv = st.session_state.anomalies[st.session_state.anomalies['is_anomaly']].to_csv(index=False)
-                st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name=f"anomalies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.warning("No anomalies to download")
-    
-    with col2:
-        if st.button("Download All Claims", use_container_width=True):
-            csv = display_data.to_csv(index=False)
+        if st.session_state.anomalies is not None and not st.session_state.anomalies.empty:
             st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name=f"claims_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
+                label="Download Anomalies CSV",
+                data=frame_to_csv_bytes(st.session_state.anomalies[st.session_state.anomalies['is_anomaly']]),
+                file_name=f"anomalies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv",
+                use_container_width=True
             )
+        else:
+            st.button("Download Anomalies CSV", disabled=True, use_container_width=True,
+                      help="No anomalies to download")
+    
+    with col2:
+        st.download_button(
+            label="Download All Claims",
+            data=frame_to_csv_bytes(display_data),
+            file_name=f"claims_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
     
     with col3:
         st.info("📋 Additional export formats coming soon")
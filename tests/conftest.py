@@ -8,20 +8,29 @@ This file contains:
 - Sample data generators
 """
 
+import hashlib
+import inspect
 import pytest
+import numpy as np
 import pandas as pd
 import networkx as nx
 from datetime import datetime, timedelta
+from pathlib import Path
+from types import MappingProxyType
 import sys
 import os
 
 # Add project root to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+# Generated fixture data is cached here between runs (git-ignored);
+# delete the directory to regenerate it
+FIXTURE_CACHE_DIR = Path(__file__).parent / '_fixtures'
+
 
 # ==================== FIXTURES: Sample Data ====================
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_claims_df():
     """
     Provides a sample claims DataFrame for testing
@@ -39,28 +48,76 @@ def sample_claims_df():
     })
 
 
-@pytest.fixture
-def large_claims_df():
+@pytest.fixture(scope="session")
+def sample_claim():
     """
-    Provides a larger claims DataFrame for performance testing
+    Provides the first sample claim as a plain dict
+    
+    The GPT prompt builders only use key access and .get(), so a dict
+    stands in for a claims row without any pandas indexing.
     
     Returns:
-        pd.DataFrame with 1000 sample claims
+        dict matching the first row of sample_claims_df
     """
-    np_import = pytest.importorskip("numpy")
+    return {
+        'patient_id': 101,
+        'provider_id': 501,
+        'claim_amount': 1000.0,
+        'diagnosis_code': 'I10',
+        'procedure_code': '99213',
+        'date': '2023-01-01',
+    }
+
+
+# Row count for large_claims_df: CLAIMS_TEST_N if set, otherwise a smaller
+# frame on CI (which sets CI=true) and the full 1000 rows locally
+LARGE_CLAIMS_N = int(os.environ.get('CLAIMS_TEST_N', 200 if os.environ.get('CI') else 1000))
+
+
+def _generate_large_claims(n: int) -> pd.DataFrame:
+    """Generate the n-row claims frame behind large_claims_df"""
+    rng = np.random.default_rng(42)
     
-    dates = pd.date_range('2023-01-01', periods=1000, freq='D')
+    dates = pd.date_range('2023-01-01', periods=n, freq='D')
     return pd.DataFrame({
-        'patient_id': np_import.random.randint(100, 500, 1000),
-        'provider_id': np_import.random.randint(500, 700, 1000),
-        'claim_amount': np_import.random.uniform(500, 5000, 1000),
-        'diagnosis_code': np_import.random.choice(['I10', 'E11', 'J45', 'I50', 'F41'], 1000),
-        'procedure_code': np_import.random.choice(['99213', '99214', '99215', '99216'], 1000),
+        'patient_id': rng.integers(100, 500, n),
+        'provider_id': rng.integers(500, 700, n),
+        'claim_amount': rng.uniform(500, 5000, n),
+        'diagnosis_code': rng.choice(['I10', 'E11', 'J45', 'I50', 'F41'], n),
+        'procedure_code': rng.choice(['99213', '99214', '99215', '99216'], n),
         'date': dates
     })
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def large_claims_df():
+    """
+    Provides a larger claims DataFrame for performance testing
+    
+    Generated once and cached as Parquet under tests/_fixtures, so later
+    sessions only read it back. The file name carries a hash of the
+    generator's source, so editing _generate_large_claims regenerates it
+    instead of reusing stale data. Shared by the whole session; tests must
+    not modify it in place.
+    
+    Returns:
+        pd.DataFrame with LARGE_CLAIMS_N sample claims
+    """
+    generator_hash = hashlib.sha1(
+        inspect.getsource(_generate_large_claims).encode('utf-8')
+    ).hexdigest()[:10]
+    path = FIXTURE_CACHE_DIR / f'large_claims_{LARGE_CLAIMS_N}_{generator_hash}.parquet'
+    if not path.exists():
+        FIXTURE_CACHE_DIR.mkdir(exist_ok=True)
+        # Write then rename so parallel workers never read a partial file
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        _generate_large_claims(LARGE_CLAIMS_N).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    
+    return pd.read_parquet(path)
+
+
+@pytest.fixture(scope="session")
 def empty_claims_df():
     """
     Provides an empty claims DataFrame for error testing
@@ -76,7 +133,7 @@ def empty_claims_df():
     })
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def claims_with_nulls():
     """
     Provides a claims DataFrame with NULL values for validation testing
@@ -92,6 +149,33 @@ def claims_with_nulls():
     })
 
 
+def duplicate_rows(df: pd.DataFrame, idx) -> pd.DataFrame:
+    """
+    Append copies of the rows at positions ``idx`` to the end of ``df``
+    
+    Concatenates each column's numpy array directly and builds the result
+    once, rather than slicing and pd.concat-ing whole frames.
+    
+    Returns:
+        pd.DataFrame with a fresh RangeIndex
+    """
+    return pd.DataFrame({
+        col: np.concatenate([df[col].to_numpy(), df[col].to_numpy()[idx]])
+        for col in df.columns
+    })
+
+
+@pytest.fixture(scope="session")
+def claims_df_with_dupes(sample_claims_df):
+    """
+    Provides sample_claims_df with its first two rows repeated at the end
+    
+    Returns:
+        pd.DataFrame with 7 claims, 2 of them exact duplicates
+    """
+    return duplicate_rows(sample_claims_df, slice(0, 2))
+
+
 # ==================== FIXTURES: Network Data ====================
 
 @pytest.fixture
@@ -148,7 +232,7 @@ def dense_network():
 
 # ==================== FIXTURES: Anomaly Data ====================
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def anomaly_results():
     """
     Provides a DataFrame with anomaly detection results
@@ -165,6 +249,82 @@ def anomaly_results():
     })
 
 
+@pytest.fixture(scope="session")
+def sorted_anomaly_results(anomaly_results):
+    """
+    Provides anomaly_results ranked by anomaly_score, highest first
+    
+    Returns:
+        pd.DataFrame sorted descending by anomaly_score
+    """
+    return anomaly_results.sort_values(
+        'anomaly_score', ascending=False, kind='stable'
+    ).reset_index(drop=True)
+
+
+# Detector outputs on sample_claims_df, computed once per session. Like the
+# data fixtures above they are shared: copy before modifying.
+
+@pytest.fixture(scope="session")
+def sanitized_sample(sample_claims_df):
+    """
+    Provides sample_claims_df after sanitize_claims_data
+    
+    Returns:
+        pd.DataFrame with sanitized sample claims
+    """
+    from utils.data import sanitize_claims_data
+    return sanitize_claims_data(sample_claims_df)
+
+
+@pytest.fixture(scope="session")
+def threshold_result_sample(sample_claims_df):
+    """
+    Provides threshold detection results (threshold=2000) on sample claims
+    
+    Returns:
+        pd.DataFrame with anomaly flags and scores
+    """
+    from utils.anomaly import detect_anomalies_threshold
+    return detect_anomalies_threshold(sample_claims_df, threshold=2000)
+
+
+@pytest.fixture(scope="session")
+def statistical_result_sample(sample_claims_df):
+    """
+    Provides z-score detection results (default threshold) on sample claims
+    
+    Returns:
+        pd.DataFrame with anomaly flags and z-scores
+    """
+    from utils.anomaly import detect_anomalies_statistical
+    return detect_anomalies_statistical(sample_claims_df)
+
+
+@pytest.fixture(scope="session")
+def forest_result_sample(sample_claims_df):
+    """
+    Provides Isolation Forest results (default contamination) on sample claims
+    
+    Returns:
+        pd.DataFrame with anomaly predictions and scores
+    """
+    from utils.anomaly import detect_anomalies_isolation_forest
+    return detect_anomalies_isolation_forest(sample_claims_df)
+
+
+@pytest.fixture(scope="session")
+def forest_result_large(large_claims_df):
+    """
+    Provides Isolation Forest results (contamination=0.1) on large claims
+    
+    Returns:
+        pd.DataFrame with anomaly predictions and scores
+    """
+    from utils.anomaly import detect_anomalies_isolation_forest
+    return detect_anomalies_isolation_forest(large_claims_df, contamination=0.1)
+
+
 # ==================== FIXTURES: Environment ====================
 
 @pytest.fixture
@@ -178,6 +338,58 @@ def mock_openai_key(monkeypatch):
     monkeypatch.setenv('OPENAI_API_KEY', 'sk-test-key-12345')
 
 
+@pytest.fixture(scope="module")
+def openai_client_patch():
+    """
+    Patches utils.gpt's OpenAI client class and Streamlit secrets once per
+    test module
+    
+    The client is a fixed tree of plain ``Mock`` objects covering only the
+    endpoints utils.gpt uses (chat.completions, files, batches); any other
+    attribute access raises AttributeError.
+    
+    Yields:
+        Mock: The client instance every OpenAI(...) call returns
+    """
+    from unittest.mock import Mock
+    import utils.gpt as gpt_module
+    
+    mock_instance = Mock(spec=['chat', 'files', 'batches'])
+    mock_instance.chat = Mock(spec=['completions'])
+    mock_instance.chat.completions = Mock(spec=['create'])
+    mock_instance.chat.completions.create = Mock()
+    mock_instance.files = Mock(spec=['create', 'content'])
+    mock_instance.files.create = Mock()
+    mock_instance.files.content = Mock()
+    mock_instance.batches = Mock(spec=['create', 'retrieve'])
+    mock_instance.batches.create = Mock()
+    mock_instance.batches.retrieve = Mock()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(gpt_module, 'OpenAI', Mock(return_value=mock_instance))
+        mp.setattr(gpt_module.st, 'secrets', {'OPENAI_API_KEY': 'sk-test'})
+        gpt_module._openai_client.clear()  # Drop clients built by other modules
+        yield mock_instance
+    gpt_module._openai_client.clear()
+
+
+@pytest.fixture
+def mock_openai(openai_client_patch):
+    """
+    Provides the module's shared mock OpenAI client, reset for this test
+    
+    Tests configure responses through e.g.
+    ``mock_openai.chat.completions.create.return_value``.
+    
+    Returns:
+        Mock: Mock OpenAI client with no recorded calls
+    """
+    import utils.gpt as gpt_module
+    
+    openai_client_patch.reset_mock(return_value=True, side_effect=True)
+    gpt_module._explanation_cache.clear()  # Each test sets its own reply
+    return openai_client_patch
+
+
 @pytest.fixture
 def temp_csv(tmp_path, sample_claims_df):
     """
@@ -197,6 +409,16 @@ def temp_csv(tmp_path, sample_claims_df):
 
 # ==================== PYTEST HOOKS ====================
 
+def pytest_addoption(parser):
+    """
+    Pytest hook to register command line options
+    """
+    parser.addoption(
+        "--runslow", action="store_true", default=False,
+        help="run tests marked slow (skipped by default)"
+    )
+
+
 def pytest_configure(config):
     """
     Pytest configuration hook - runs before test collection
@@ -211,8 +433,12 @@ def pytest_collection_modifyitems(config, items):
     """
     Pytest hook to modify collected test items
     
-    Automatically marks tests based on name patterns
+    Automatically marks tests based on name patterns, then skips slow
+    tests unless --runslow was given
     """
+    skip_slow = pytest.mark.skip(reason="slow test: use --runslow to run")
+    run_slow = config.getoption("--runslow")
+    
     for item in items:
         # Mark slow tests
         if "test_load" in item.nodeid or "test_large" in item.nodeid:
@@ -221,6 +447,9 @@ def pytest_collection_modifyitems(config, items):
         # Mark integration tests
         if "integration" in item.nodeid or "api" in item.nodeid.lower():
             item.add_marker(pytest.mark.integration)
+        
+        if not run_slow and "slow" in item.keywords:
+            item.add_marker(skip_slow)
 
 
 # ==================== TEST UTILITIES ====================
@@ -228,12 +457,8 @@ def pytest_collection_modifyitems(config, items):
 class MockStreamlit:
     """Mock Streamlit module for testing"""
     
-    class Secrets(dict):
-        def __init__(self):
-            super().__init__()
-            self['OPENAI_API_KEY'] = 'sk-test-key'
-    
-    secrets = Secrets()
+    # Read-only mapping, like st.secrets: supports `in` and ['KEY'] lookups
+    secrets = MappingProxyType({'OPENAI_API_KEY': 'sk-test-key'})
     
     @staticmethod
     def cache_data(**kwargs):
@@ -4,18 +4,15 @@ Unit tests for utils/anomaly.py module
 Tests anomaly detection methods, scoring, and analysis
 """
 
+import warnings
 import pytest
 import pandas as pd
 import numpy as np
-import sys
-import os
-
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
 from utils.anomaly import (
     detect_anomalies_threshold,
     detect_anomalies_statistical,
     detect_anomalies_isolation_forest,
+    detect_frequency_anomalies,
     combine_anomaly_scores,
     get_top_anomalies,
     get_anomaly_summary
@@ -38,7 +35,7 @@ class TestThresholdDetection:
         result = detect_anomalies_threshold(sample_claims_df, percentile=75)
         
         assert 'is_anomaly' in result.columns
-        assert result['is_anomaly'].any()  # Should have some anomalies
+        assert result['is_anomaly'].to_numpy().any()  # Should have some anomalies
     
     def test_threshold_returns_df(self, sample_claims_df):
         """Test that threshold detection returns DataFrame"""
@@ -49,7 +46,7 @@ class TestThresholdDetection:
     def test_threshold_anomaly_scores_valid(self, sample_claims_df):
         """Test that anomaly scores are valid"""
         result = detect_anomalies_threshold(sample_claims_df, threshold=1500)
-        assert (result['anomaly_score'] >= 0).all()
+        assert (result['anomaly_score'].to_numpy() >= 0).all()
 
 
 class TestStatisticalDetection:
@@ -63,47 +60,43 @@ class TestStatisticalDetection:
         assert 'z_score' in result.columns
         assert 'anomaly_score' in result.columns
     
-    def test_statistical_returns_df(self, sample_claims_df):
+    def test_statistical_returns_df(self, sample_claims_df, statistical_result_sample):
         """Test that statistical detection returns DataFrame"""
-        result = detect_anomalies_statistical(sample_claims_df)
-        assert isinstance(result, pd.DataFrame)
-        assert len(result) == len(sample_claims_df)
+        assert isinstance(statistical_result_sample, pd.DataFrame)
+        assert len(statistical_result_sample) == len(sample_claims_df)
     
     def test_statistical_with_large_z_threshold(self, large_claims_df):
         """Test with high Z-score threshold"""
         result = detect_anomalies_statistical(large_claims_df, z_threshold=5.0)
         # Few or no anomalies with high threshold
-        assert result['is_anomaly'].sum() <= len(large_claims_df) * 0.1
+        assert result['is_anomaly'].to_numpy().sum() <= len(large_claims_df) * 0.1
     
     def test_statistical_with_low_z_threshold(self, sample_claims_df):
         """Test with low Z-score threshold"""
         result = detect_anomalies_statistical(sample_claims_df, z_threshold=1.0)
         # More anomalies with low threshold
-        assert result['is_anomaly'].any()
+        assert result['is_anomaly'].to_numpy().any()
 
 
+@pytest.mark.slow
 class TestIsolationForest:
     """Tests for Isolation Forest anomaly detection"""
     
-    def test_isolation_forest_basic(self, sample_claims_df):
+    def test_isolation_forest_basic(self, forest_result_sample):
         """Test basic Isolation Forest detection"""
-        result = detect_anomalies_isolation_forest(sample_claims_df, contamination=0.2)
-        
-        assert 'is_anomaly' in result.columns
-        assert 'anomaly_score' in result.columns
+        assert 'is_anomaly' in forest_result_sample.columns
+        assert 'anomaly_score' in forest_result_sample.columns
     
-    def test_isolation_forest_returns_df(self, sample_claims_df):
+    def test_isolation_forest_returns_df(self, sample_claims_df, forest_result_sample):
         """Test that Isolation Forest returns DataFrame"""
-        result = detect_anomalies_isolation_forest(sample_claims_df)
-        assert isinstance(result, pd.DataFrame)
-        assert len(result) == len(sample_claims_df)
+        assert isinstance(forest_result_sample, pd.DataFrame)
+        assert len(forest_result_sample) == len(sample_claims_df)
     
-    def test_isolation_forest_contamination_rate(self, large_claims_df):
+    def test_isolation_forest_contamination_rate(self, forest_result_large):
         """Test that contamination rate is respected"""
-        contamination = 0.1
-        result = detect_anomalies_isolation_forest(large_claims_df, contamination=contamination)
+        contamination = 0.1  # Rate forest_result_large was fitted with
         
-        actual_rate = result['is_anomaly'].sum() / len(result)
+        actual_rate = forest_result_large['is_anomaly'].to_numpy().sum() / len(forest_result_large)
         # Allow some tolerance due to randomness
         assert 0 <= actual_rate <= contamination + 0.05
     
@@ -114,18 +107,68 @@ class TestIsolationForest:
             features=['claim_amount']
         )
         assert 'is_anomaly' in result.columns
+    
+    def test_isolation_forest_fills_missing_with_mean(self, sample_claims_df):
+        """Test that a missing feature value is scored as the column mean"""
+        df = sample_claims_df.assign(claim_amount=sample_claims_df['claim_amount'].astype(float))
+        df['visits'] = np.arange(len(df), dtype=float)
+        df.loc[df.index[0], 'claim_amount'] = np.nan
+        filled = df.fillna({'claim_amount': df['claim_amount'].mean()})
+        
+        features = ['claim_amount', 'visits']
+        result = detect_anomalies_isolation_forest(df, features=features)
+        expected = detect_anomalies_isolation_forest(filled, features=features)
+        
+        np.testing.assert_array_equal(result['anomaly_score'], expected['anomaly_score'])
+
+
+class TestFrequencyDetection:
+    """Tests for claim frequency anomaly detection"""
+    
+    def test_frequency_flags_busy_provider_day(self):
+        """Test that every claim in an unusually busy provider-day is flagged"""
+        df = pd.DataFrame({
+            'provider_id': [501, 501, 501, 502, 503, 501],
+            'claim_amount': [100.0] * 6,
+            'date': pd.to_datetime([
+                '2023-01-01', '2023-01-01', '2023-01-01',
+                '2023-01-01', '2023-01-02', '2023-01-02'
+            ]),
+        })
+        
+        result = detect_frequency_anomalies(df, threshold_percentile=75)
+        
+        assert result['frequency_anomaly'].tolist() == [True, True, True, False, False, False]
+    
+    def test_frequency_weekly_windows_start_monday(self):
+        """Test that weekly windows split Sunday from the following Monday"""
+        df = pd.DataFrame({
+            'provider_id': [501] * 4 + [502] * 2,
+            'claim_amount': [100.0] * 6,
+            # Mon-Sun 2023-01-02..08 for 501; 502's Sunday and Monday span two weeks
+            'date': pd.to_datetime([
+                '2023-01-02', '2023-01-04', '2023-01-06', '2023-01-08',
+                '2023-01-08', '2023-01-09'
+            ]),
+        })
+        
+        result = detect_frequency_anomalies(df, window='W', threshold_percentile=50)
+        
+        assert result['frequency_anomaly'].tolist() == [True] * 4 + [False] * 2
+    
+    def test_frequency_without_dates(self, sample_claims_df):
+        """Test that frames without a date column are never flagged"""
+        result = detect_frequency_anomalies(sample_claims_df.drop(columns=['date']))
+        assert not result['frequency_anomaly'].to_numpy().any()
 
 
 class TestCombineScores:
     """Tests for combining multiple anomaly scores"""
     
-    def test_combine_two_methods(self, sample_claims_df):
+    def test_combine_two_methods(self, statistical_result_sample):
         """Test combining two anomaly detection methods"""
-        threshold_result = detect_anomalies_threshold(sample_claims_df, threshold=2000)
-        statistical_result = detect_anomalies_statistical(sample_claims_df)
-        
         combined = combine_anomaly_scores(
-            statistical_result,
+            statistical_result_sample,
             ['anomaly_score', 'is_anomaly'],
             weights=[0.6, 0.4]
         )
@@ -142,34 +185,58 @@ class TestCombineScores:
         
         assert result['combined_anomaly_score'].max() <= 1.0
     
-    def test_combine_normalizes_weights(self, sample_claims_df):
+    def test_combine_normalizes_weights(self, statistical_result_sample):
         """Test that weights are normalized"""
-        statistical_result = detect_anomalies_statistical(sample_claims_df)
-        
         result1 = combine_anomaly_scores(
-            statistical_result.copy(),
+            statistical_result_sample,
             ['anomaly_score'],
             weights=[1.0]
         )
         result2 = combine_anomaly_scores(
-            statistical_result.copy(),
+            statistical_result_sample,
             ['anomaly_score'],
             weights=[2.0]
         )
         
         # Should be equal when weights are proportionally the same
-        assert np.allclose(result1['combined_anomaly_score'], result2['combined_anomaly_score'])
+        scores1 = result1['combined_anomaly_score'].to_numpy()
+        scores2 = result2['combined_anomaly_score'].to_numpy()
+        assert np.allclose(scores1, scores2, rtol=0, atol=1e-12)
+    
+    def test_combine_leaves_input_unchanged(self, anomaly_results):
+        """Test that combining scores does not modify the input frame"""
+        before = anomaly_results.copy()
+        combine_anomaly_scores(anomaly_results, ['anomaly_score'], weights=[1.0])
+        pd.testing.assert_frame_equal(anomaly_results, before)
+    
+    def test_combine_fewer_weights_than_columns(self):
+        """Test that columns without a weight are ignored, like zip()"""
+        df = pd.DataFrame({'a': [0.0, 1.0], 'b': [1.0, 0.0], 'c': [5.0, 9.0]})
+        
+        result = combine_anomaly_scores(df, ['a', 'b', 'c'], weights=[0.6, 0.4])
+        
+        assert np.allclose(result['combined_anomaly_score'], [0.4, 0.6])
+    
+    def test_combine_all_nan_column_is_silent(self):
+        """Test that an all-NaN column contributes 0 without warnings"""
+        df = pd.DataFrame({'a': [0.0, 2.0], 'b': [np.nan, np.nan]})
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            result = combine_anomaly_scores(df, ['a', 'b'])
+        
+        assert np.allclose(result['combined_anomaly_score'], [0.0, 0.5])
 
 
 class TestAnomalyRanking:
     """Tests for getting top anomalies"""
     
-    def test_get_top_anomalies(self, anomaly_results):
+    def test_get_top_anomalies(self, anomaly_results, sorted_anomaly_results):
         """Test getting top N anomalies"""
         result = get_top_anomalies(anomaly_results, n=2)
         
         assert len(result) == 2
-        assert (result['anomaly_score'].iloc[0] >= result['anomaly_score'].iloc[1])
+        assert result['anomaly_score'].tolist() == sorted_anomaly_results['anomaly_score'].head(2).tolist()
     
     def test_get_top_more_than_available(self, anomaly_results):
         """Test requesting more anomalies than available"""
@@ -177,13 +244,24 @@ class TestAnomalyRanking:
         
         assert len(result) == len(anomaly_results)
     
-    def test_get_top_maintains_order(self, anomaly_results):
+    def test_get_top_matches_nlargest_with_ties(self):
+        """Test that ties keep row order and NaN scores only fill in last"""
+        df = pd.DataFrame(
+            {'anomaly_score': [2.0, np.nan, 3.0, 2.0, 1.0, 2.0]},
+            index=[10, 11, 12, 13, 14, 15]
+        )
+        
+        for n in (1, 3, 5, 6):
+            pd.testing.assert_frame_equal(
+                get_top_anomalies(df, n=n), df.nlargest(n, 'anomaly_score')
+            )
+    
+    def test_get_top_maintains_order(self, anomaly_results, sorted_anomaly_results):
         """Test that top anomalies are properly ordered"""
         result = get_top_anomalies(anomaly_results, n=5)
         
-        # Check descending order
-        scores = result['anomaly_score'].tolist()
-        assert scores == sorted(scores, reverse=True)
+        # Same rows, in descending score order
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), sorted_anomaly_results)
 
 
 class TestAnomalySummary:
@@ -226,7 +304,7 @@ class TestAnomalyEdgeCases:
         })
         
         result = detect_anomalies_threshold(df, threshold=1000)
-        assert result['is_anomaly'].all()
+        assert result['is_anomaly'].to_numpy().all()
     
     def test_no_anomalies(self):
         """Test when no data points are anomalies"""
@@ -238,11 +316,24 @@ class TestAnomalyEdgeCases:
         })
         
         result = detect_anomalies_threshold(df, threshold=10000)
-        assert not result['is_anomaly'].any()
+        assert not result['is_anomaly'].to_numpy().any()
+    
+    @pytest.mark.parametrize("detect", [
+        lambda df: detect_anomalies_threshold(df, threshold=2000),
+        detect_anomalies_statistical,
+        detect_frequency_anomalies,
+    ], ids=['threshold', 'statistical', 'frequency'])
+    def test_detection_leaves_input_unchanged(self, sample_claims_df, detect):
+        """Test that detectors sharing the input's columns never modify it"""
+        before = sample_claims_df.copy()
+        result = detect(sample_claims_df)
+        
+        pd.testing.assert_frame_equal(sample_claims_df, before)
+        assert len(result.columns) > len(sample_claims_df.columns)
     
     def test_single_row_dataframe(self, sample_claims_df):
         """Test anomaly detection on single row"""
-        single_row = sample_claims_df.iloc[0:1].copy()
+        single_row = sample_claims_df.iloc[0:1]
         result = detect_anomalies_statistical(single_row)
         
         # Single row might not have meaningful z-scores
@@ -252,14 +343,17 @@ class TestAnomalyEdgeCases:
 class TestAnomalyIntegration:
     """Integration tests for anomaly detection"""
     
-    def test_multiple_methods_workflow(self, sample_claims_df):
+    @pytest.mark.slow
+    def test_multiple_methods_workflow(
+        self, sample_claims_df, threshold_result_sample,
+        statistical_result_sample, forest_result_sample
+    ):
         """Test using multiple detection methods"""
-        threshold = detect_anomalies_threshold(sample_claims_df, threshold=2000)
-        statistical = detect_anomalies_statistical(sample_claims_df)
-        forest = detect_anomalies_isolation_forest(sample_claims_df)
-        
         # All should return DataFrames of same length
-        assert len(threshold) == len(statistical) == len(forest) == len(sample_claims_df)
+        n = len(sample_claims_df)
+        assert len(threshold_result_sample) == n
+        assert len(statistical_result_sample) == n
+        assert len(forest_result_sample) == n
     
     def test_detection_ranking_workflow(self, sample_claims_df):
         """Test detecting then ranking anomalies"""
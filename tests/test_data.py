@@ -7,113 +7,265 @@ Tests data loading, validation, filtering, and statistical calculations
 import pytest
 import pandas as pd
 import numpy as np
-from io import StringIO
-import sys
-import os
-
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
+from io import BytesIO
+import utils.data as data_module
 from utils.data import (
+    load_claims_data,
+    read_claims_csv,
     sanitize_claims_data,
     filter_claims_by_parameters,
     get_statistics
 )
 
 
+class TestReadClaimsCSV:
+    """Tests for CSV parsing"""
+    
+    def test_read_matches_default_parser(self, sample_claims_df):
+        """Test that the pyarrow reader returns what read_csv would"""
+        csv_bytes = sample_claims_df.to_csv(index=False).encode('utf-8')
+        
+        result = read_claims_csv(BytesIO(csv_bytes))
+        expected = pd.read_csv(BytesIO(csv_bytes))
+        
+        # pyarrow may already have parsed the dates; compare them as datetimes
+        for frame in (result, expected):
+            frame['date'] = pd.to_datetime(frame['date'])
+        pd.testing.assert_frame_equal(result, expected)
+    
+    def test_read_rejects_ragged_rows_like_read_csv(self):
+        """Test that files pyarrow rejects fall back to the C parser"""
+        with pytest.raises(pd.errors.ParserError):
+            read_claims_csv(BytesIO(b"a,b\n1,2\n3,4,5\n"))
+
+
+class TestClaimsDiskCache:
+    """Tests for the on-disk Parquet cache behind load_claims_data"""
+    
+    URL = 'https://example.com/claims.csv'
+    
+    @pytest.fixture
+    def csv_reads(self, sample_claims_df, tmp_path, monkeypatch):
+        """Point the cache at tmp_path and record every CSV fetch"""
+        reads = []
+        
+        def fake_read(source):
+            reads.append(source)
+            return sample_claims_df.copy()
+        
+        monkeypatch.setattr(data_module, 'CLAIMS_CACHE_DIR', tmp_path)
+        monkeypatch.setattr(data_module, 'read_claims_csv', fake_read)
+        load_claims_data.clear()
+        yield reads
+        load_claims_data.clear()
+    
+    def test_cold_start_reads_parquet(self, csv_reads):
+        """Test that a fresh process reuses the cached Parquet file"""
+        first = load_claims_data(self.URL)
+        load_claims_data.clear()  # Simulate a restart: in-memory cache gone
+        second = load_claims_data(self.URL)
+        
+        assert csv_reads == [self.URL]
+        pd.testing.assert_frame_equal(second, first.reset_index(drop=True))
+    
+    def test_stale_cache_refetches(self, csv_reads, monkeypatch):
+        """Test that cache files older than the TTL are ignored"""
+        monkeypatch.setattr(data_module, 'CLAIMS_CACHE_TTL', 0)
+        load_claims_data(self.URL)
+        load_claims_data.clear()
+        load_claims_data(self.URL)
+        
+        assert csv_reads == [self.URL, self.URL]
+    
+    def test_raw_github_format_reuses_default_dataset(self, csv_reads, sanitized_sample, monkeypatch):
+        """Test that a raw-format URL is served from the default dataset's cache"""
+        data_module._write_cached_claims(data_module.DEFAULT_CLAIMS_URL, sanitized_sample)
+        monkeypatch.setattr(data_module, 'read_claims_csv', lambda source: pd.DataFrame({'PATIENTID': ['p1']}))
+        monkeypatch.setattr(data_module.requests, 'get', lambda *args, **kwargs: pytest.fail("downloaded"))
+        
+        result = load_claims_data(self.URL)
+        
+        pd.testing.assert_frame_equal(result, sanitized_sample.reset_index(drop=True))
+
+
+class TestMergedClaimsLoad:
+    """Tests for loading and merging the GitHub claims + transactions CSVs"""
+    
+    CLAIMS_CSV = (
+        b"Id,PATIENTID,PROVIDERID,DIAGNOSIS1,SERVICEDATE\n"
+        b"c1,101,501,I10,2023-01-01\n"
+        b"c2,102,502,E11,2023-01-02\n"
+    )
+    TRANSACTIONS_CSV = (
+        b"ID,CLAIMID,AMOUNT,PROCEDURECODE,FROMDATE\n"
+        b"t1,c1,100.0,99213,2023-01-01\n"
+        b"t2,c2,250.0,99214,2023-01-02\n"
+    )
+    
+    def test_downloads_run_concurrently(self, tmp_path, monkeypatch):
+        """Test that both CSVs are in flight at once and merged by claim ID"""
+        import threading
+        from types import SimpleNamespace
+        
+        # Each fake download waits for the other one to start
+        both_started = threading.Barrier(2, timeout=5)
+        bodies = {'claims': self.CLAIMS_CSV, 'transactions': self.TRANSACTIONS_CSV}
+        
+        def fake_get(url, timeout):
+            both_started.wait()
+            return SimpleNamespace(content=bodies[url], raise_for_status=lambda: None)
+        
+        monkeypatch.setattr(data_module, 'CLAIMS_CACHE_DIR', tmp_path)
+        monkeypatch.setattr(data_module.requests, 'get', fake_get)
+        data_module._load_and_merge_claims_data.clear()
+        
+        df = data_module._load_and_merge_claims_data('claims', 'transactions')
+        data_module._load_and_merge_claims_data.clear()
+        
+        assert df['claim_amount'].tolist() == [100.0, 250.0]
+        assert df['patient_id'].tolist() == [101, 102]
+
+
 class TestDataSanitization:
     """Tests for data sanitization and validation"""
     
-    def test_sanitize_removes_duplicates(self, sample_claims_df):
+    def test_sanitize_removes_duplicates(self, sample_claims_df, claims_df_with_dupes):
         """Test that sanitize_claims_data removes duplicate rows"""
-        df_with_dupes = pd.concat([sample_claims_df, sample_claims_df.iloc[0:2]])
-        result = sanitize_claims_data(df_with_dupes)
+        result = sanitize_claims_data(claims_df_with_dupes)
         assert len(result) == len(sample_claims_df)
     
-    def test_sanitize_keeps_valid_data(self, sample_claims_df):
-        """Test that valid data is preserved after sanitization"""
-        result = sanitize_claims_data(sample_claims_df.copy())
+    def test_sanitize_keeps_categorical_uuid_ids(self):
+        """Test that re-sanitizing categorical UUID IDs keeps every row"""
+        df = pd.DataFrame({
+            'patient_id': ['1b4e28ba-2fa1-11d2-883f-0016d3cca427', '6fa459ea-ee8a-3ca4-894e-db77e160355e'],
+            'provider_id': [501, 502],
+            'claim_amount': [100.0, 200.0],
+        })
+        once = sanitize_claims_data(df)
+        twice = sanitize_claims_data(once)
+        
+        assert isinstance(once['patient_id'].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(twice, once)
+    
+    def test_sanitize_duplicates_ignore_codes(self, sample_claims_df):
+        """Test that claims matching on patient, provider, date and amount are duplicates"""
+        recoded = sample_claims_df.head(1).assign(diagnosis_code='E11', procedure_code='99999')
+        result = sanitize_claims_data(pd.concat([sample_claims_df, recoded]))
+        
         assert len(result) == len(sample_claims_df)
-        assert set(result.columns) == set(sample_claims_df.columns)
+        assert result.index.equals(pd.RangeIndex(len(sample_claims_df)))
+    
+    def test_sanitize_keeps_valid_data(self, sample_claims_df, sanitized_sample):
+        """Test that valid data is preserved after sanitization"""
+        assert len(sanitized_sample) == len(sample_claims_df)
+        assert set(sanitized_sample.columns) == set(sample_claims_df.columns)
+    
+    def test_sanitize_leaves_input_unchanged(self, claims_with_nulls):
+        """Test that sanitization does not modify the input frame"""
+        before = claims_with_nulls.copy()
+        sanitize_claims_data(claims_with_nulls)
+        pd.testing.assert_frame_equal(claims_with_nulls, before)
     
     def test_sanitize_handles_null_values(self, claims_with_nulls):
         """Test that null values are handled correctly"""
         result = sanitize_claims_data(claims_with_nulls)
         # Should remove rows with nulls in CRITICAL columns (patient_id, provider_id)
         # But diagnosis_code can be None (filled with 'UNKNOWN') and that's ok
-        assert result['patient_id'].notna().all()
-        assert result['provider_id'].notna().all()
+        assert pd.notna(result['patient_id'].to_numpy()).all()
+        assert pd.notna(result['provider_id'].to_numpy()).all()
     
     def test_sanitize_removes_negative_amounts(self, sample_claims_df):
         """Test that negative claim amounts are removed"""
         df = sample_claims_df.copy()
         df.loc[0, 'claim_amount'] = -1000
         result = sanitize_claims_data(df)
-        assert (result['claim_amount'] > 0).all()
+        assert (result['claim_amount'].to_numpy() > 0).all()
     
-    def test_sanitize_preserves_data_types(self, sample_claims_df):
+    def test_sanitize_preserves_data_types(self, sanitized_sample):
         """Test that data types are preserved/corrected"""
-        result = sanitize_claims_data(sample_claims_df.copy())
-        assert result['patient_id'].dtype in [np.int64, np.int32, int]
-        assert result['provider_id'].dtype in [np.int64, np.int32, int]
-        assert result['claim_amount'].dtype in [np.float64, np.float32, float]
+        assert sanitized_sample['patient_id'].dtype in [np.int64, np.int32, int]
+        assert sanitized_sample['provider_id'].dtype in [np.int64, np.int32, int]
+        assert sanitized_sample['claim_amount'].dtype in [np.float64, np.float32, float]
+    
+    def test_sanitize_categorizes_string_columns(self, sample_claims_df, sanitized_sample):
+        """Test that diagnosis codes are stored as categoricals"""
+        assert isinstance(sanitized_sample['diagnosis_code'].dtype, pd.CategoricalDtype)
+        assert set(sanitized_sample['diagnosis_code']) == set(sample_claims_df['diagnosis_code'])
+    
+    def test_sanitize_uses_arrow_strings(self, sample_claims_df, sanitized_sample):
+        """Test that procedure codes are stored as Arrow-backed strings"""
+        assert sanitized_sample['procedure_code'].dtype == 'string[pyarrow]'
+        assert sanitized_sample['procedure_code'].tolist() == sample_claims_df['procedure_code'].tolist()
+    
+    @pytest.mark.parametrize("debug", [False, True])
+    def test_sanitize_diagnostics_only_when_debugging(self, sample_claims_df, monkeypatch, debug):
+        """Test that loader diagnostics reach the page only with DEBUG_DATA_LOADER"""
+        writes = []
+        monkeypatch.setattr(data_module, 'DEBUG', debug)
+        monkeypatch.setattr(data_module.st, 'write', writes.append)
+        
+        sanitize_claims_data(sample_claims_df)
+        
+        assert bool(writes) is debug
 
 
 class TestDataFiltering:
     """Tests for data filtering operations"""
     
-    def test_filter_by_amount_min(self, sample_claims_df):
-        """Test filtering by minimum amount"""
-        result = filter_claims_by_parameters(sample_claims_df, min_amount=1500)
-        assert (result['claim_amount'] >= 1500).all()
-    
-    def test_filter_by_amount_max(self, sample_claims_df):
-        """Test filtering by maximum amount"""
-        result = filter_claims_by_parameters(sample_claims_df, max_amount=2500)
-        assert (result['claim_amount'] <= 2500).all()
-    
-    def test_filter_by_amount_range(self, sample_claims_df):
-        """Test filtering by amount range"""
-        result = filter_claims_by_parameters(
-            sample_claims_df,
-            min_amount=1000,
-            max_amount=2500
-        )
-        assert (result['claim_amount'] >= 1000).all()
-        assert (result['claim_amount'] <= 2500).all()
-    
-    def test_filter_by_patient_ids(self, sample_claims_df):
-        """Test filtering by patient IDs"""
-        patient_ids = [101, 103]
-        result = filter_claims_by_parameters(sample_claims_df, patient_ids=patient_ids)
-        assert set(result['patient_id'].unique()) == set(patient_ids)
-    
-    def test_filter_by_provider_ids(self, sample_claims_df):
-        """Test filtering by provider IDs"""
-        provider_ids = [501, 502]
-        result = filter_claims_by_parameters(sample_claims_df, provider_ids=provider_ids)
-        assert set(result['provider_id'].unique()) == set(provider_ids)
-    
-    def test_filter_combined(self, sample_claims_df):
-        """Test combined filtering"""
-        result = filter_claims_by_parameters(
-            sample_claims_df,
-            min_amount=1000,
-            max_amount=3000,
-            provider_ids=[501]
-        )
-        assert (result['claim_amount'] >= 1000).all()
-        assert (result['claim_amount'] <= 3000).all()
-        assert (result['provider_id'] == 501).all()
-    
-    def test_filter_no_parameters(self, sample_claims_df):
-        """Test that filtering with no parameters returns all data"""
-        result = filter_claims_by_parameters(sample_claims_df)
-        assert len(result) == len(sample_claims_df)
-    
-    def test_filter_empty_result(self, sample_claims_df):
-        """Test filtering that returns empty result"""
-        result = filter_claims_by_parameters(sample_claims_df, min_amount=10000)
-        assert len(result) == 0
+    @pytest.mark.parametrize("kwargs,check", [
+        pytest.param(
+            {'min_amount': 1500},
+            lambda result, source: (result['claim_amount'].to_numpy() >= 1500).all(),
+            id="amount_min"
+        ),
+        pytest.param(
+            {'max_amount': 2500},
+            lambda result, source: (result['claim_amount'].to_numpy() <= 2500).all(),
+            id="amount_max"
+        ),
+        pytest.param(
+            {'min_amount': 1000, 'max_amount': 2500},
+            lambda result, source: result['claim_amount'].between(1000, 2500).to_numpy().all(),
+            id="amount_range"
+        ),
+        pytest.param(
+            {'patient_ids': [101, 103]},
+            lambda result, source: np.array_equal(np.unique(result['patient_id'].to_numpy()), [101, 103]),
+            id="patient_ids"
+        ),
+        pytest.param(
+            {'provider_ids': [501, 502]},
+            lambda result, source: np.array_equal(np.unique(result['provider_id'].to_numpy()), [501, 502]),
+            id="provider_ids"
+        ),
+        pytest.param(
+            {'min_amount': 1000, 'max_amount': 3000, 'provider_ids': [501]},
+            lambda result, source: (
+                result['claim_amount'].between(1000, 3000).to_numpy().all()
+                and (result['provider_id'].to_numpy() == 501).all()
+            ),
+            id="combined"
+        ),
+        pytest.param(
+            {'date_range': (pd.Timestamp('2023-01-02'), pd.Timestamp('2023-01-04'))},
+            lambda result, source: result['date'].dt.day.tolist() == [2, 3, 4],
+            id="date_range"
+        ),
+        pytest.param(
+            {},
+            lambda result, source: len(result) == len(source),
+            id="no_parameters"
+        ),
+        pytest.param(
+            {'min_amount': 10000},
+            lambda result, source: len(result) == 0,
+            id="empty_result"
+        ),
+    ])
+    def test_filter(self, sample_claims_df, kwargs, check):
+        """Test that each filter combination keeps only matching claims"""
+        result = filter_claims_by_parameters(sample_claims_df, **kwargs)
+        assert check(result, sample_claims_df)
 
 
 class TestStatistics:
@@ -148,7 +300,7 @@ class TestStatistics:
     def test_statistics_with_large_dataset(self, large_claims_df):
         """Test statistics with larger dataset"""
         stats = get_statistics(large_claims_df)
-        assert stats['total_claims'] == 1000
+        assert stats['total_claims'] == len(large_claims_df)
         assert stats['total_amount'] > 0
         assert stats['avg_claim'] > 0
 
@@ -163,7 +315,7 @@ class TestDataEdgeCases:
     
     def test_single_row_dataframe(self, sample_claims_df):
         """Test handling of single-row DataFrame"""
-        single_row = sample_claims_df.iloc[0:1].copy()
+        single_row = sample_claims_df.iloc[0:1]
         result = sanitize_claims_data(single_row)
         assert len(result) == 1
     
@@ -179,7 +331,7 @@ class TestDataEdgeCases:
         # Now we keep rows with NULL claim_amount (filled as 0)
         # Only rows are removed if patient_id or provider_id are NULL
         assert len(result) == 3  # All rows kept (nulls filled as 0)
-        assert (result['claim_amount'] >= 0).all()
+        assert (result['claim_amount'].to_numpy() >= 0).all()
     
     def test_zero_claim_amounts(self):
         """Test handling of zero claim amounts"""
@@ -192,7 +344,7 @@ class TestDataEdgeCases:
         result = sanitize_claims_data(df)
         # Now we KEEP zero amounts (they are valid claims)
         assert len(result) == 2  # Both rows kept
-        assert (result['claim_amount'] >= 0).all()  # All amounts >= 0
+        assert (result['claim_amount'].to_numpy() >= 0).all()  # All amounts >= 0
 
 
 class TestDataIntegration:
@@ -203,17 +355,16 @@ class TestDataIntegration:
         sanitized = sanitize_claims_data(claims_with_nulls)
         filtered = filter_claims_by_parameters(sanitized, min_amount=1000)
         assert len(filtered) > 0
-        assert (filtered['claim_amount'] >= 1000).all()
+        assert (filtered['claim_amount'].to_numpy() >= 1000).all()
     
-    def test_complete_workflow(self, sample_claims_df):
+    def test_complete_workflow(self, sample_claims_df, sanitized_sample):
         """Test complete data processing workflow"""
         # Sanitize
-        clean = sanitize_claims_data(sample_claims_df.copy())
-        assert len(clean) == len(sample_claims_df)
+        assert len(sanitized_sample) == len(sample_claims_df)
         
         # Filter
-        filtered = filter_claims_by_parameters(clean, min_amount=1500)
-        assert (filtered['claim_amount'] >= 1500).all()
+        filtered = filter_claims_by_parameters(sanitized_sample, min_amount=1500)
+        assert (filtered['claim_amount'].to_numpy() >= 1500).all()
         
         # Statistics
         stats = get_statistics(filtered)
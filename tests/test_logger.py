@@ -0,0 +1,184 @@
+"""
+Unit tests for utils/logger.py module
+
+Tests logger setup, queued handlers, and buffered file output
+"""
+
+import logging
+import logging.handlers
+import threading
+import time
+import pytest
+import utils.logger as logger_module
+from utils.logger import BufferedFileHandler, setup_logger
+
+
+def stop_listener(listener):
+    """Stop a setup_logger listener, drain its queue and close its handlers"""
+    logger_module._listeners.remove(listener)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll ``condition`` until it is true or ``timeout`` seconds pass"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def buffered_logger(tmp_path, request):
+    """
+    Provides a logger writing through a BufferedFileHandler
+    
+    The flush interval defaults to 60 seconds so the periodic flush never
+    fires mid-test; parametrize indirectly to use a shorter one.
+    
+    Yields:
+        Tuple of (logger, handler, log file path)
+    """
+    log_file = tmp_path / "app.log"
+    handler = BufferedFileHandler(log_file, flush_interval=getattr(request, 'param', 60.0))
+    logger = logging.getLogger(f"test_buffered_{tmp_path.name}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(handler)
+    yield logger, handler, log_file
+    logger.removeHandler(handler)
+    handler.close()
+
+
+@pytest.fixture
+def logger_name(request):
+    """
+    Provides a fresh logger name for setup_logger, cleaned up afterwards
+    
+    Stops any listener started during the test, closes its handlers and
+    forgets the name so setup_logger state doesn't leak between tests.
+    
+    Yields:
+        str: Logger name
+    """
+    name = f"test_setup_{request.node.name}"
+    started = len(logger_module._listeners)
+    yield name
+    
+    for listener in logger_module._listeners[started:]:
+        stop_listener(listener)
+    logger_module._configured.discard(name)
+    logger = logging.getLogger(name)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+
+class TestBufferedFileHandler:
+    """Tests for the buffered, periodically flushed log file handler"""
+    
+    def test_info_buffered_until_flush(self, buffered_logger):
+        """Test that an INFO record only reaches disk on a flush"""
+        logger, handler, log_file = buffered_logger
+        
+        logger.info("buffered message")
+        assert "buffered message" not in log_file.read_text()
+        
+        handler.flush()
+        assert "buffered message" in log_file.read_text()
+    
+    @pytest.mark.parametrize('buffered_logger', [0.05], indirect=True)
+    def test_info_flushed_after_interval(self, buffered_logger):
+        """Test that the flush thread writes buffered records on its own"""
+        logger, handler, log_file = buffered_logger
+        
+        logger.info("buffered message")
+        
+        assert wait_for(lambda: "buffered message" in log_file.read_text())
+    
+    def test_error_flushed_immediately(self, buffered_logger):
+        """Test that an ERROR record is written without waiting"""
+        logger, handler, log_file = buffered_logger
+        
+        logger.error("urgent message")
+        assert "urgent message" in log_file.read_text()
+    
+    def test_close_stops_flusher(self, buffered_logger):
+        """Test that closing the handler stops its flush thread"""
+        logger, handler, log_file = buffered_logger
+        assert handler._flusher.is_alive()
+        
+        logger.info("final message")
+        handler.close()
+        handler._flusher.join(timeout=5)
+        
+        assert not handler._flusher.is_alive()
+        assert "final message" in log_file.read_text()  # Flushed on close
+
+
+class TestSetupLogger:
+    """Tests for queued logger configuration"""
+    
+    def test_records_go_through_queue(self, logger_name, tmp_path):
+        """Test that the logger only holds a QueueHandler feeding the file"""
+        log_file = tmp_path / "queued.log"
+        logger = setup_logger(logger_name, level="DEBUG", log_file=log_file, stream=False)
+        
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+        listener = logger_module._listeners[-1]
+        assert isinstance(listener.handlers[0], BufferedFileHandler)
+        
+        logger.debug("queued message")
+        stop_listener(listener)  # Drains the queue and flushes the file
+        
+        assert "queued message" in log_file.read_text()
+    
+    def test_level_filters_queued_records(self, logger_name, capsys):
+        """Test that records below the level never reach the console"""
+        logger = setup_logger(logger_name, level="WARNING")
+        listener = logger_module._listeners[-1]
+        
+        logger.info("quiet message")
+        logger.warning("loud message")
+        stop_listener(listener)
+        
+        output = capsys.readouterr().out
+        assert "loud message" in output
+        assert "quiet message" not in output
+    
+    def test_setup_is_idempotent(self, logger_name):
+        """Test that repeated setup returns the same logger without new handlers"""
+        logger = setup_logger(logger_name)
+        started = len(logger_module._listeners)
+        
+        assert setup_logger(logger_name) is logger
+        assert len(logger.handlers) == 1
+        assert len(logger_module._listeners) == started
+    
+    def test_concurrent_setup_adds_one_handler(self, logger_name):
+        """Test that threads racing to set up a logger attach one handler"""
+        started = len(logger_module._listeners)
+        barrier = threading.Barrier(8)
+        loggers = []
+        
+        def configure():
+            barrier.wait()
+            loggers.append(setup_logger(logger_name))
+        
+        threads = [threading.Thread(target=configure) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(loggers) == 8
+        assert all(logger is loggers[0] for logger in loggers)
+        assert len(loggers[0].handlers) == 1
+        assert len(logger_module._listeners) == started + 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -6,12 +6,8 @@ Tests network construction, visualization, and statistics
 
 import pytest
 import networkx as nx
+import numpy as np
 import pandas as pd
-import sys
-import os
-
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
 from utils.network import (
     build_patient_provider_network,
     get_network_statistics,
@@ -67,6 +63,18 @@ class TestNetworkConstruction:
         G = build_patient_provider_network(empty_claims_df)
         assert G.number_of_nodes() == 0
         assert G.number_of_edges() == 0
+    
+    def test_build_network_uuid_ids(self):
+        """Test that UUID IDs are shortened to their first 8 characters"""
+        df = pd.DataFrame({
+            'patient_id': ['1b4e28ba-2fa1-11d2-883f-0016d3cca427'] * 2,
+            'provider_id': pd.Categorical(['6fa459ea-ee8a-3ca4-894e-db77e160355e'] * 2),
+            'claim_amount': [100.0, 250.0]
+        })
+        G = build_patient_provider_network(df)
+        edge_data = G.get_edge_data("Patient_1b4e28ba", "Provider_6fa459ea")
+        assert edge_data['claim_amount'] == 350.0
+        assert edge_data['count'] == 2
 
 
 class TestNetworkStatistics:
@@ -102,6 +110,14 @@ class TestNetworkStatistics:
         assert stats['avg_degree'] == 0.0
         assert stats['density'] == 0.0
     
+    def test_network_statistics_igraph_engine(self, dense_network):
+        """Test that the igraph engine reports the same statistics"""
+        pytest.importorskip('igraph')
+        G = dense_network.copy()
+        G.add_node("Patient_999", node_type='patient')
+        
+        assert get_network_statistics(G, engine='igraph') == get_network_statistics(G)
+    
     def test_network_connectivity(self, dense_network):
         """Test connectivity calculations"""
         stats = get_network_statistics(dense_network)
@@ -147,6 +163,65 @@ class TestSuspiciousClusters:
         clusters_large = detect_suspicious_clusters(dense_network, min_cluster_size=5)
         
         assert clusters_small['suspicious_cliques'] >= clusters_large['suspicious_cliques']
+    
+    def test_detect_shared_patient_cluster(self, dense_network):
+        """Test that providers sharing patients form one cluster"""
+        clusters = detect_suspicious_clusters(dense_network, min_cluster_size=3)
+        
+        assert clusters['suspicious_cliques'] == 1
+        assert clusters['clique_details'][0] == [
+            "Provider_501", "Provider_502", "Patient_101", "Patient_102", "Patient_103"
+        ]
+    
+    def test_detect_shared_patients_threshold(self, dense_network):
+        """Test that provider pairs below the shared-patient cutoff are ignored"""
+        clusters = detect_suspicious_clusters(dense_network, min_shared_patients=4)
+        assert clusters['suspicious_cliques'] == 0
+        assert clusters['total_cliques'] == 1  # Still a candidate pair
+    
+    def test_detect_low_jaccard_pair_ignored(self, dense_network):
+        """Test that providers with mostly different patients are not flagged"""
+        G = dense_network.copy()
+        for i in range(200, 210):
+            G.add_node(f"Patient_{i}", node_type='patient')
+            G.add_edge(f"Patient_{i}", "Provider_501")
+        
+        clusters = detect_suspicious_clusters(G)
+        assert clusters['suspicious_cliques'] == 0
+        assert detect_suspicious_clusters(G, min_jaccard=0.2)['suspicious_cliques'] == 1
+    
+    def test_detect_no_clusters_in_random_claims(self):
+        """Test that uniformly random claims raise no suspicious clusters"""
+        from utils.data import generate_sample_claims_data
+        
+        np.random.seed(0)
+        G = build_patient_provider_network(generate_sample_claims_data(20000))
+        clusters = detect_suspicious_clusters(G)
+        
+        assert clusters['suspicious_cliques'] == 0
+        assert clusters['total_cliques'] > 0
+    
+    def test_detect_cliques_prunes_to_core(self):
+        """Test that cliques outside the k-core are not enumerated"""
+        G = nx.complete_graph(4)
+        nx.add_path(G, [3, 10, 11, 12, 13])
+        G.add_edge(20, 20)
+        
+        clusters = detect_suspicious_clusters(G, min_cluster_size=3)
+        
+        assert clusters['total_cliques'] == 1
+        assert sorted(clusters['clique_details'][0]) == [0, 1, 2, 3]
+    
+    def test_detect_cliques_igraph_engine(self):
+        """Test that the igraph engine finds the same cliques as networkx"""
+        pytest.importorskip('igraph')
+        G = nx.gnp_random_graph(60, 0.15, seed=7)
+        
+        expected = detect_suspicious_clusters(G, min_cluster_size=3)
+        result = detect_suspicious_clusters(G, min_cluster_size=3, engine='igraph')
+        
+        assert result['total_cliques'] == expected['total_cliques']
+        assert result['suspicious_cliques'] == expected['suspicious_cliques']
 
 
 class TestNetworkVisualization:
@@ -171,6 +246,69 @@ class TestNetworkVisualization:
         # Node trace should be the second trace
         node_trace = fig.data[1]
         assert node_trace.marker.color is not None
+    
+    def test_visualization_large_graph_hover_labels_only(self):
+        """Test that large graphs drop static node labels"""
+        from utils.network import MAX_LABELED_NODES, create_network_visualization
+        
+        G = nx.Graph()
+        G.add_nodes_from(
+            (f"Patient_{i}", {'node_type': 'patient'}) for i in range(MAX_LABELED_NODES + 1)
+        )
+        pos = {node: (0.0, 0.0) for node in G}
+        
+        node_trace = create_network_visualization(G, pos=pos).data[1]
+        assert node_trace.mode == 'markers'
+        assert node_trace.text is None
+        assert len(node_trace.hovertext) == G.number_of_nodes()
+    
+    def test_visualization_uses_precomputed_layout(self, sample_network):
+        """Test that a precomputed layout is used for node positions"""
+        from utils.network import compute_network_layout, create_network_visualization
+        
+        pos = compute_network_layout(sample_network)
+        fig = create_network_visualization(sample_network, pos=pos)
+        
+        node_trace = fig.data[1]
+        expected_x = [pos[node][0] for node in sample_network.nodes()]
+        assert list(node_trace.x) == pytest.approx(expected_x, abs=1e-6)
+    
+    def test_layout_large_graph_uses_fewer_iterations(self, monkeypatch):
+        """Test that layouts of very large graphs run fewer iterations"""
+        import utils.network as network_module
+        from utils.network import compute_network_layout
+        
+        calls = []
+        monkeypatch.setattr(network_module.nx, 'spring_layout', lambda G, **kwargs: calls.append(kwargs))
+        
+        compute_network_layout(nx.path_graph(10))
+        compute_network_layout(nx.path_graph(network_module.LARGE_LAYOUT_NODES + 1))
+        
+        assert [call['iterations'] for call in calls] == [50, 20]
+    
+    def test_layout_igraph_engine(self, sample_network, monkeypatch):
+        """Test that the igraph engine positions every node from seeded starts"""
+        igraph = pytest.importorskip('igraph')
+        from unittest.mock import Mock
+        from utils.network import compute_network_layout
+        
+        set_rng = Mock()
+        monkeypatch.setattr(igraph, 'set_random_number_generator', set_rng)
+        pos = compute_network_layout(sample_network, engine='igraph')
+        
+        assert set(pos) == set(sample_network.nodes())
+        assert np.abs(np.array(list(pos.values()))).max() <= 1.0 + 1e-9
+        set_rng.assert_not_called()  # Process-wide generator left alone
+    
+    def test_visualization_edge_segments(self, sample_network):
+        """Test that each edge is drawn as its own line segment"""
+        from utils.network import create_network_visualization
+        
+        fig = create_network_visualization(sample_network)
+        
+        edge_trace = fig.data[0]
+        assert len(edge_trace.x) == 3 * sample_network.number_of_edges()
+        assert np.isnan(edge_trace.x[2::3]).all()
 
 
 class TestNetworkEdgeCases:
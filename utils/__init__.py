@@ -5,6 +5,20 @@ This package contains core modules for data processing, network analysis,
 anomaly detection, and GPT integration.
 """
 
-from .logger import get_logger, setup_logger
-
 __all__ = ["get_logger", "setup_logger"]
+
+
+def __getattr__(name):
+    """
+    Import the logger helpers on first access (PEP 562).
+    
+    Importing a submodule such as utils.data runs this package first, so
+    anything imported here is paid for by every caller; the logger module
+    is only loaded when something actually asks for it.
+    """
+    if name in __all__:
+        from . import logger
+        value = getattr(logger, name)
+        globals()[name] = value  # Cache so later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,10 +3,11 @@ Anomaly detection module for HealthClaim Analytics Hub
 Implements multiple anomaly detection methods for fraud detection
 """
 
+import hashlib
+import warnings
+
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 from typing import Tuple, List
 import streamlit as st
 
@@ -21,7 +22,7 @@ def detect_anomalies_threshold(
     Detect anomalies using simple threshold-based approach.
     
     Args:
-        df: Claims DataFrame
+        df: Claims DataFrame (not modified)
         column: Column to analyze for anomalies
         threshold: Fixed threshold value
         percentile: Percentile-based threshold (e.g., 95 for 95th percentile)
@@ -29,15 +30,24 @@ def detect_anomalies_threshold(
     Returns:
         DataFrame with anomaly flag and anomaly score
     """
-    result = df.copy()
+    # Shallow copy: detectors only add or replace whole columns, so the
+    # input's column buffers can be shared without the caller seeing changes
+    result = df.copy(deep=False)
+    
+    # Convert the column once; the percentile, score and flag all read the
+    # same float64 buffer, and each output is written in a single pass
+    values = result[column].to_numpy(dtype=np.float64)
+    
+    if percentile is not None and threshold is None:
+        # Same linear interpolation and NaN skipping as Series.quantile
+        # (all-NaN or empty columns give NaN, without the numpy warning)
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            threshold = np.nanquantile(values, percentile / 100)
     
     if threshold is not None:
-        result['anomaly_score'] = result[column] / threshold
-        result['is_anomaly'] = result[column] > threshold
-    elif percentile is not None:
-        threshold = result[column].quantile(percentile / 100)
-        result['anomaly_score'] = result[column] / threshold
-        result['is_anomaly'] = result[column] > threshold
+        result['anomaly_score'] = np.divide(values, threshold)
+        result['is_anomaly'] = np.greater(values, threshold)
     else:
         result['anomaly_score'] = 0
         result['is_anomaly'] = False
@@ -54,26 +64,75 @@ def detect_anomalies_statistical(
     Detect anomalies using statistical z-score method.
     
     Args:
-        df: Claims DataFrame
+        df: Claims DataFrame (not modified)
         column: Column to analyze
         z_threshold: Z-score threshold (standard deviations from mean)
         
     Returns:
         DataFrame with anomaly flag and z-scores
     """
-    result = df.copy()
+    result = df.copy(deep=False)
+    
+    # Work on one float64 buffer in place instead of chaining Series ops,
+    # each of which would allocate a full-length temporary. Mean and sample
+    # std (ddof=1, skipping NaN like Series.std) come from the same buffer.
+    z_scores = result[column].to_numpy(dtype=np.float64, copy=True)
+    valid = ~np.isnan(z_scores)
+    count = np.count_nonzero(valid)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.sum(z_scores, where=valid) / count
+        z_scores -= mean
+        std = np.sqrt(np.sum(np.square(z_scores), where=valid) / (count - 1))
+        # The scores are always returned, so |x - mean| / std is needed per
+        # element anyway; scale by the reciprocal to multiply, not divide
+        np.abs(z_scores, out=z_scores)
+        z_scores *= 1.0 / std
+    
+    result['z_score'] = z_scores
+    result['is_anomaly'] = z_scores > z_threshold
+    result['anomaly_score'] = z_scores
     
-    mean = result[column].mean()
-    std = result[column].std()
+    return result
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _fit_isolation_forest(
+    data_key: str,
+    _X_scaled: np.ndarray,
+    contamination: float,
+    random_state: int
+):
+    """
+    Fit an Isolation Forest, shared across reruns for identical inputs.
     
-    result['z_score'] = np.abs((result[column] - mean) / std)
-    result['is_anomaly'] = result['z_score'] > z_threshold
-    result['anomaly_score'] = result['z_score']
+    cache_resource keeps the fitted model itself instead of pickling a
+    result frame, and the leading underscore stops Streamlit from hashing
+    the feature matrix; data_key (a digest of it) identifies it instead.
     
-    return result
+    Args:
+        data_key: Digest of the scaled feature matrix
+        _X_scaled: Scaled feature matrix to fit on
+        contamination: Expected proportion of outliers (0.0 to 0.5)
+        random_state: Random seed for reproducibility
+        
+    Returns:
+        Fitted IsolationForest
+    """
+    from joblib import parallel_backend
+    from sklearn.ensemble import IsolationForest
+    
+    iso_forest = IsolationForest(
+        contamination=contamination,
+        random_state=random_state,
+        n_estimators=100,
+        n_jobs=-1
+    )
+    
+    # The threading backend lets tree building spread across all cores
+    with parallel_backend('threading'):
+        return iso_forest.fit(_X_scaled)
 
 
-@st.cache_data
 def detect_anomalies_isolation_forest(
     df: pd.DataFrame,
     features: List[str] = None,
@@ -85,7 +144,7 @@ def detect_anomalies_isolation_forest(
     More sophisticated ML-based approach for complex patterns.
     
     Args:
-        df: Claims DataFrame
+        df: Claims DataFrame (not modified)
         features: List of columns to use for anomaly detection
         contamination: Expected proportion of outliers (0.0 to 0.5)
         random_state: Random seed for reproducibility
@@ -93,7 +152,7 @@ def detect_anomalies_isolation_forest(
     Returns:
         DataFrame with anomaly predictions and scores
     """
-    result = df.copy()
+    result = df.copy(deep=False)
     
     if features is None:
         features = ['claim_amount']
@@ -105,26 +164,37 @@ def detect_anomalies_isolation_forest(
         result['anomaly_score'] = 0
         return result
     
-    # Prepare data
-    X = result[available_features].copy()
-    X = X.fillna(X.mean())
+    # scikit-learn is imported here rather than at module level: it is the
+    # slowest import in the app and only this detector needs it
+    from joblib import parallel_backend
+    from sklearn.preprocessing import StandardScaler
+    
+    # Prepare data as one C-ordered (row-major) matrix, so each sample's
+    # features sit together for the trees' row-wise splits, and fill NaN
+    # with the column mean in place rather than through a pandas copy
+    X = np.ascontiguousarray(result[available_features].to_numpy(dtype=np.float64))
+    missing_rows, missing_cols = np.nonzero(np.isnan(X))
+    if len(missing_rows):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN column
+            X[missing_rows, missing_cols] = np.nanmean(X, axis=0)[missing_cols]
     
     # Scale features
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # The forest's trees compare in float32, so convert once up front rather
+    # than letting sklearn copy the matrix again on both fit and score
+    X_scaled = np.ascontiguousarray(scaler.fit_transform(X), dtype=np.float32)
     
-    # Train Isolation Forest
-    iso_forest = IsolationForest(
-        contamination=contamination,
-        random_state=random_state,
-        n_estimators=100
-    )
+    # Fit (or reuse) the forest; only the O(n) scoring runs on every call
+    digest = hashlib.blake2b(X_scaled.tobytes(), digest_size=16).hexdigest()
+    data_key = f"{X_scaled.shape}:{digest}"
+    iso_forest = _fit_isolation_forest(data_key, X_scaled, contamination, random_state)
     
-    # Predict anomalies (-1 = anomaly, 1 = normal)
-    predictions = iso_forest.fit_predict(X_scaled)
-    scores = iso_forest.score_samples(X_scaled)
+    with parallel_backend('threading'):
+        scores = iso_forest.score_samples(X_scaled)
     
-    result['is_anomaly'] = predictions == -1
+    # Same rule as IsolationForest.predict, without scoring a second time
+    result['is_anomaly'] = scores < iso_forest.offset_
     result['anomaly_score'] = -scores  # Negate so higher = more anomalous
     
     return result
@@ -140,7 +210,7 @@ def detect_frequency_anomalies(
     Detect anomalies based on claim frequency patterns.
     
     Args:
-        df: Claims DataFrame with date column
+        df: Claims DataFrame with date column (not modified)
         entity_col: Column to group by (provider_id, patient_id, etc.)
         window: Time window for frequency ('D'=day, 'W'=week, 'M'=month)
         threshold_percentile: Percentile threshold for flagging as anomaly
@@ -148,7 +218,7 @@ def detect_frequency_anomalies(
     Returns:
         DataFrame with frequency anomaly indicators
     """
-    result = df.copy()
+    result = df.copy(deep=False)
     
     if 'date' not in result.columns:
         result['frequency_anomaly'] = False
@@ -156,24 +226,54 @@ def detect_frequency_anomalies(
     
     # Group by entity and date window, count occurrences
     result['date'] = pd.to_datetime(result['date'])
-    result['date_window'] = result['date'].dt.to_period(window)
+    result['date_window'] = _date_buckets(result['date'], window)
     
-    frequency = result.groupby([entity_col, 'date_window']).size().reset_index(name='claim_count')
+    groups = result.groupby([entity_col, 'date_window'], observed=True)
     
-    # Calculate threshold
-    threshold = frequency['claim_count'].quantile(threshold_percentile / 100)
+    # Calculate threshold over per-window counts
+    threshold = groups.size().quantile(threshold_percentile / 100)
     
-    # Merge back to original
-    freq_anomaly = frequency[frequency['claim_count'] > threshold]
-    result['frequency_anomaly'] = result.apply(
-        lambda row: (row[entity_col], row['date_window']) in 
-                    zip(freq_anomaly[entity_col], freq_anomaly['date_window']),
-        axis=1
-    )
+    # Broadcast each window's count back to its rows (NaN for rows with a
+    # missing key, which compares False)
+    claim_counts = groups['date'].transform('size')
+    result['frequency_anomaly'] = claim_counts.to_numpy() > threshold
     
     return result
 
 
+def _date_buckets(dates: pd.Series, window: str):
+    """
+    Number each date's time window, as an integer bucket.
+    
+    Daily, weekly and monthly windows are computed with datetime64 integer
+    arithmetic, matching to_period's boundaries (weeks run Monday-Sunday)
+    without building Period objects, so grouping hashes plain int64s.
+    Other windows fall back to to_period.
+    
+    Args:
+        dates: Datetime column
+        window: Time window ('D', 'W' or 'M'; other pandas frequencies
+            are passed to to_period)
+        
+    Returns:
+        Nullable Int64 array of bucket numbers (<NA> for missing dates),
+        or a PeriodArray for other windows
+    """
+    if window not in ('D', 'W', 'M') or dates.dt.tz is not None:
+        return dates.dt.to_period(window).array
+    
+    values = dates.to_numpy(dtype='datetime64[ns]')
+    if window == 'M':
+        buckets = values.astype('datetime64[M]').view('i8')
+    else:
+        buckets = values.astype('datetime64[D]').view('i8')
+        if window == 'W':
+            # Day 0 (1970-01-01) is a Thursday; shift so weeks start Monday
+            buckets = (buckets + 3) // 7
+    
+    return pd.arrays.IntegerArray(buckets, np.isnat(values))
+
+
 def combine_anomaly_scores(
     df: pd.DataFrame,
     anomaly_columns: List[str],
@@ -183,33 +283,44 @@ def combine_anomaly_scores(
     Combine multiple anomaly detection methods into a single score.
     
     Args:
-        df: DataFrame with multiple anomaly score columns
+        df: DataFrame with multiple anomaly score columns (not modified)
         anomaly_columns: List of anomaly score column names
-        weights: Optional weights for each column
+        weights: Optional weights for each column; columns beyond the
+            last weight are ignored
         
     Returns:
         DataFrame with combined anomaly score
     """
-    result = df.copy()
+    result = df.copy(deep=False)
     
     if weights is None:
         weights = [1.0] * len(anomaly_columns)
     
+    # Columns pair up with weights like zip(): extras are dropped
+    anomaly_columns = list(anomaly_columns)[:len(weights)]
+    
     # Normalize weights
-    weights = [w / sum(weights) for w in weights]
-    
-    # Calculate weighted average
-    result['combined_anomaly_score'] = 0.0
-    for col, weight in zip(anomaly_columns, weights):
-        if col in result.columns:
-            # Normalize column to 0-1 range
-            col_min = result[col].min()
-            col_max = result[col].max()
-            if col_max > col_min:
-                normalized = (result[col] - col_min) / (col_max - col_min)
-            else:
-                normalized = 0
-            result['combined_anomaly_score'] += normalized * weight
+    weights = np.asarray(weights, dtype=np.float64) / sum(weights)
+    
+    # Weighted average of each column rescaled to 0-1. Missing and constant
+    # columns contribute 0, but their weight still counts toward the total.
+    present = [i for i, col in enumerate(anomaly_columns) if col in result.columns]
+    combined = np.zeros(len(result))
+    if present and len(result) > 0:
+        scores = result[[anomaly_columns[i] for i in present]].to_numpy(dtype=np.float64)
+        with warnings.catch_warnings():
+            # All-NaN columns give NaN bounds and are skipped below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            col_min = np.nanmin(scores, axis=0)
+            span = np.nanmax(scores, axis=0) - col_min
+        keep = span > 0
+        if keep.any():
+            # (x - min) / span * w == (x - min) @ (w / span): one pass, one GEMV
+            scores = scores[:, keep]
+            scores -= col_min[keep]
+            combined = scores @ (weights[present][keep] / span[keep])
+    
+    result['combined_anomaly_score'] = combined
     
     return result
 
@@ -233,7 +344,27 @@ def get_top_anomalies(
     if anomaly_score_col not in df.columns:
         return df.head(n)
     
-    return df.nlargest(n, anomaly_score_col)
+    # Same rows and order as df.nlargest(n, col): ties go to the earlier row
+    # and NaN scores only fill in at the end. Selecting with np.partition is
+    # O(N) rather than nlargest's heap, and only the n winners get sorted.
+    if n <= 0:
+        return df.iloc[:0]
+    
+    scores = df[anomaly_score_col].to_numpy(dtype=np.float64)
+    missing = np.isnan(scores)
+    valid = np.flatnonzero(~missing)
+    
+    if n < len(valid):
+        valid_scores = scores[valid]
+        kth = np.partition(valid_scores, len(valid) - n)[len(valid) - n]
+        above = valid[valid_scores > kth]
+        ties = valid[valid_scores == kth][:n - len(above)]
+        valid = np.concatenate([above, ties])
+    
+    order = valid[np.lexsort((valid, -scores[valid]))]
+    if len(order) < n:
+        order = np.concatenate([order, np.flatnonzero(missing)[:n - len(order)]])
+    return df.iloc[order]
 
 
 def get_anomaly_summary(
@@ -253,14 +384,27 @@ def get_anomaly_summary(
     if anomaly_col not in df.columns:
         return {}
     
+    # One mask and two masked reductions, instead of slicing out an
+    # anomaly frame and a normal frame just to average one column
+    flags = df[anomaly_col].to_numpy(dtype=bool)
+    amounts = df['claim_amount'].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(amounts)  # Series.mean() skips NaN
+    
     total = len(df)
-    anomalies = df[df[anomaly_col]].shape[0]
+    anomalies = int(flags.sum())
+    normal = total - anomalies
+    
+    anomaly_valid = flags & valid
+    normal_valid = ~flags & valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_anomaly = amounts.sum(where=anomaly_valid) / np.count_nonzero(anomaly_valid)
+        avg_normal = amounts.sum(where=normal_valid) / np.count_nonzero(normal_valid)
     
     return {
         'total_claims': total,
         'anomalies_detected': anomalies,
         'anomaly_percentage': (anomalies / total * 100) if total > 0 else 0,
-        'normal_claims': total - anomalies,
-        'avg_amount_anomaly': df[df[anomaly_col]]['claim_amount'].mean() if anomalies > 0 else 0,
-        'avg_amount_normal': df[~df[anomaly_col]]['claim_amount'].mean() if (total - anomalies) > 0 else 0,
+        'normal_claims': normal,
+        'avg_amount_anomaly': avg_anomaly if anomalies > 0 else 0,
+        'avg_amount_normal': avg_normal if normal > 0 else 0,
     }
@@ -3,13 +3,62 @@ Data loading and processing module for HealthClaim Analytics Hub
 Handles loading patient claims data and preprocessing
 """
 
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import streamlit as st
-from typing import Optional
+from typing import List, Optional
 import numpy as np
-from datetime import datetime, timedelta
+from pathlib import Path
 import requests
-from io import StringIO
+from io import BytesIO
+
+
+# On-disk Parquet copies of fetched claims, so a cold start skips the
+# download and CSV parse. Override the location with CLAIMS_CACHE_DIR.
+CLAIMS_CACHE_DIR = Path(os.environ.get(
+    'CLAIMS_CACHE_DIR',
+    Path(__file__).resolve().parent.parent / '.cache' / 'claims'
+))
+CLAIMS_CACHE_TTL = 3600  # seconds, same as load_claims_data's cache_data ttl
+
+# Default dataset: the neural-nexus Galway sample, as separate claims and
+# transactions files merged on claim ID
+DEFAULT_CLAIMS_URL = "https://github.com/HackmaniaGX/neural-nexus-healthcare-fwa-analysis/raw/main/data/sample_data/csv/galway/claims.csv"
+DEFAULT_TRANSACTIONS_URL = "https://github.com/HackmaniaGX/neural-nexus-healthcare-fwa-analysis/raw/main/data/sample_data/csv/galway/claims_transactions.csv"
+
+# Columns identifying a claim; rows agreeing on all of them are duplicates
+CLAIM_KEY_COLUMNS = ['patient_id', 'provider_id', 'date', 'claim_amount']
+
+logger = logging.getLogger(__name__)
+
+
+def _secret_flag(name: str) -> bool:
+    """Read a boolean Streamlit secret, False when there is no secrets.toml."""
+    try:
+        return bool(st.secrets.get(name, False))
+    except FileNotFoundError:
+        return False
+
+
+# Loader diagnostics (row counts, null counts, column listings) are logged at
+# DEBUG level; set DEBUG_DATA_LOADER in secrets to also show them on the page
+DEBUG = _secret_flag("DEBUG_DATA_LOADER")
+
+
+def _debugging() -> bool:
+    """Whether loader diagnostics are wanted, to skip costly column scans."""
+    return DEBUG or logger.isEnabledFor(logging.DEBUG)
+
+
+def _debug(message: str) -> None:
+    """Emit a loader diagnostic to the log, and to the page when DEBUG is on."""
+    logger.debug(message)
+    if DEBUG:
+        st.write(message)
 
 
 def generate_sample_claims_data(num_records: int = 1000) -> pd.DataFrame:
@@ -33,14 +82,15 @@ def generate_sample_claims_data(num_records: int = 1000) -> pd.DataFrame:
     claim_amounts = np.random.gamma(shape=2, scale=1000, size=num_records)
     claim_amounts = np.clip(claim_amounts, 100, 10000)
     
-    # Diagnosis codes (simplified)
-    diagnosis_codes = [f"ICD-{np.random.randint(1000, 9999)}" for _ in range(num_records)]
+    # Diagnosis codes (simplified); codes and dates are drawn as whole
+    # arrays rather than one RNG call and one string per row
+    diagnosis_codes = np.char.add('ICD-', np.random.randint(1000, 9999, num_records).astype('U4'))
     
     # Procedure codes
-    procedure_codes = [f"CPT-{np.random.randint(10000, 99999)}" for _ in range(num_records)]
+    procedure_codes = np.char.add('CPT-', np.random.randint(10000, 99999, num_records).astype('U5'))
     
     # Dates (last 365 days)
-    dates = [datetime.now() - timedelta(days=np.random.randint(0, 365)) for _ in range(num_records)]
+    dates = pd.Timestamp.now() - pd.to_timedelta(np.random.randint(0, 365, num_records), unit='D')
     
     df = pd.DataFrame({
         'patient_id': patient_ids,
@@ -54,6 +104,117 @@ def generate_sample_claims_data(num_records: int = 1000) -> pd.DataFrame:
     return df
 
 
+def read_claims_csv(source, **kwargs) -> pd.DataFrame:
+    """
+    Parse a claims CSV with pyarrow's multithreaded reader.
+    
+    Falls back to pandas' C parser when pyarrow is unavailable or rejects
+    the file (e.g. ragged rows), so behavior matches a plain read_csv.
+    
+    Args:
+        source: Path, URL or binary file-like object
+        **kwargs: Extra read_csv options (e.g. usecols, parse_dates),
+            passed to both parsers
+        
+    Returns:
+        Parsed DataFrame (NumPy-backed dtypes, as read_csv returns; pyarrow
+        may parse date-only columns to datetime.date objects, which
+        sanitize_claims_data normalizes with pd.to_datetime)
+    """
+    try:
+        return pd.read_csv(source, engine='pyarrow', **kwargs)
+    except (ImportError, ValueError):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.read_csv(source, **kwargs)
+
+
+# Columns _load_and_merge_claims_data maps from the GitHub dataset; the rest
+# of those (wide) files is never parsed
+CLAIMS_SOURCE_COLUMNS = ['Id', 'PATIENTID', 'PROVIDERID', 'DIAGNOSIS1', 'SERVICEDATE']
+TRANSACTIONS_SOURCE_COLUMNS = ['CLAIMID', 'AMOUNT', 'PROCEDURECODE', 'FROMDATE']
+SOURCE_DATE_COLUMNS = ['SERVICEDATE', 'FROMDATE']
+
+
+def _read_source_columns(content: bytes, columns: List[str]) -> pd.DataFrame:
+    """
+    Parse only the wanted columns of a downloaded CSV, dates included.
+    
+    Columns missing from the file are skipped rather than raising, so the
+    merge can still fall back to its defaults for them.
+    
+    Args:
+        content: Raw CSV bytes
+        columns: Columns to read, if present
+        
+    Returns:
+        DataFrame with the present columns, date columns as datetime64
+    """
+    buffer = BytesIO(content)
+    header = set(pd.read_csv(buffer, nrows=0).columns)
+    buffer.seek(0)
+    
+    usecols = [col for col in columns if col in header]
+    return read_claims_csv(
+        buffer,
+        usecols=usecols,
+        parse_dates=[col for col in SOURCE_DATE_COLUMNS if col in usecols]
+    )
+
+
+def _claims_cache_path(source_url: str) -> Path:
+    """Parquet cache file for claims loaded from source_url."""
+    digest = hashlib.sha256(source_url.encode('utf-8')).hexdigest()[:16]
+    return CLAIMS_CACHE_DIR / f"claims_{digest}.parquet"
+
+
+def _read_cached_claims(source_url: str) -> Optional[pd.DataFrame]:
+    """
+    Return sanitized claims cached on disk for source_url, if still fresh.
+    
+    Args:
+        source_url: URL the claims were originally loaded from
+        
+    Returns:
+        Cached DataFrame, or None if missing, stale or unreadable
+    """
+    path = _claims_cache_path(source_url)
+    try:
+        if time.time() - path.stat().st_mtime >= CLAIMS_CACHE_TTL:
+            return None
+        df = pd.read_parquet(path)
+    except Exception:
+        # A missing or corrupt cache file just means loading from source
+        return None
+    
+    # Parquet round-trips Arrow strings as Python-backed ones; restore them
+    if 'procedure_code' in df.columns and isinstance(df['procedure_code'].dtype, pd.StringDtype):
+        df['procedure_code'] = df['procedure_code'].astype('string[pyarrow]')
+    return df
+
+
+def _write_cached_claims(source_url: str, df: pd.DataFrame) -> None:
+    """
+    Best-effort save of sanitized claims to the on-disk cache.
+    
+    Written to a temporary file and renamed into place, so concurrent
+    sessions never read a half-written file. Failures (e.g. a read-only
+    filesystem) are ignored; the in-memory cache still applies.
+    
+    Args:
+        source_url: URL the claims were loaded from
+        df: Sanitized claims DataFrame
+    """
+    path = _claims_cache_path(source_url)
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+
+
 @st.cache_data(ttl=3600)
 def load_claims_data(url: Optional[str] = None, _cache_buster: int = 1) -> pd.DataFrame:
     """
@@ -71,12 +232,14 @@ def load_claims_data(url: Optional[str] = None, _cache_buster: int = 1) -> pd.Da
     """
     if url is None:
         # Try to load from the actual GitHub structure with merged data
-        claims_url = "https://github.com/HackmaniaGX/neural-nexus-healthcare-fwa-analysis/raw/main/data/sample_data/csv/galway/claims.csv"
-        transactions_url = "https://github.com/HackmaniaGX/neural-nexus-healthcare-fwa-analysis/raw/main/data/sample_data/csv/galway/claims_transactions.csv"
-        return _load_and_merge_claims_data(claims_url, transactions_url)
+        return _load_default_claims()
+    
+    cached = _read_cached_claims(url)
+    if cached is not None:
+        return cached
     
     try:
-        df = pd.read_csv(url)
+        df = read_claims_csv(url)
         
         # Validate required columns
         required_cols = ['patient_id', 'provider_id', 'claim_amount', 'diagnosis_code']
@@ -87,15 +250,14 @@ def load_claims_data(url: Optional[str] = None, _cache_buster: int = 1) -> pd.Da
             if 'PATIENTID' in df.columns or 'CLAIMID' in df.columns:
                 # This is the GitHub format, try to merge with transactions
                 st.info("Detected healthcare dataset format - loading and merging claims data...")
-                claims_url = "https://github.com/HackmaniaGX/neural-nexus-healthcare-fwa-analysis/raw/main/data/sample_data/csv/galway/claims.csv"
-                transactions_url = "https://github.com/HackmaniaGX/neural-nexus-healthcare-fwa-analysis/raw/main/data/sample_data/csv/galway/claims_transactions.csv"
-                return _load_and_merge_claims_data(claims_url, transactions_url)
+                return _load_default_claims()
             else:
                 st.error(f"Missing required columns: {missing_cols}")
                 return pd.DataFrame()
         
         # Data validation and sanitization
         df = sanitize_claims_data(df)
+        _write_cached_claims(url, df)
         return df
         
     except Exception as e:
@@ -106,11 +268,52 @@ def load_claims_data(url: Optional[str] = None, _cache_buster: int = 1) -> pd.Da
         return df
 
 
+def _load_default_claims() -> pd.DataFrame:
+    """
+    Load the merged neural-nexus claims dataset.
+    
+    Both load_claims_data paths that need it (no URL, or a URL in the raw
+    GitHub format) come through here, so they share the Parquet cache and
+    the cached download + merge rather than fetching it independently.
+    
+    Returns:
+        Sanitized, merged claims DataFrame
+    """
+    cached = _read_cached_claims(DEFAULT_CLAIMS_URL)
+    if cached is not None:
+        return cached
+    return _load_and_merge_claims_data(DEFAULT_CLAIMS_URL, DEFAULT_TRANSACTIONS_URL)
+
+
+def _fetch_source_columns(url: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Download a CSV and parse the wanted columns, raising on HTTP errors.
+    
+    The raw bytes are parsed straight from the response (never decoded to
+    a str) and dropped as soon as this returns, so only the parsed columns
+    outlive the download.
+    
+    Args:
+        url: URL to fetch
+        columns: Columns to read, if present
+        
+    Returns:
+        DataFrame with the present columns
+    """
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return _read_source_columns(response.content, columns)
+
+
+@st.cache_data(ttl=CLAIMS_CACHE_TTL, max_entries=4, show_spinner=False)
 def _load_and_merge_claims_data(claims_url: str, transactions_url: str) -> pd.DataFrame:
     """
     Load and merge claims and transactions data from GitHub.
     Maps healthcare dataset schema to our standardized columns.
     
+    Cached on its own so every caller, not only load_claims_data, reuses
+    the download and merge; restarts are covered by the Parquet cache.
+    
     Args:
         claims_url: URL to claims CSV
         transactions_url: URL to transactions CSV
@@ -119,143 +322,96 @@ def _load_and_merge_claims_data(claims_url: str, transactions_url: str) -> pd.Da
         Merged and mapped DataFrame
     """
     try:
-        # Load both datasets using requests to bypass Git LFS
-        st.write("🔍 Loading claims CSV from GitHub...")
-        claims_response = requests.get(claims_url, timeout=30)
-        claims_response.raise_for_status()
-        claims_df = pd.read_csv(StringIO(claims_response.text))
-        st.write(f"✅ Loaded claims: {claims_df.shape[0]} rows, {claims_df.shape[1]} cols")
-        st.write(f"   Columns: {list(claims_df.columns)[:10]}...")
-        
-        # Load transactions CSV
-        st.write("🔍 Loading transactions CSV from GitHub...")
-        trans_response = requests.get(transactions_url, timeout=30)
-        trans_response.raise_for_status()
-        transactions_df = pd.read_csv(StringIO(trans_response.text))
-        st.write(f"✅ Loaded transactions: {transactions_df.shape[0]} rows, {transactions_df.shape[1]} cols")
-        st.write(f"   Columns: {list(transactions_df.columns)[:10]}...")
-        
-        # Rename transaction columns for clarity
-        st.write("🔍 Renaming transaction columns...")
-        rename_dict = {
-            'ID': 'TRANSACTIONID',
-            'APPOINTMENTID': 'TRANS_APPOINTMENTID'
-        }
-        # Only rename if they exist
-        rename_dict = {k: v for k, v in rename_dict.items() if k in transactions_df.columns}
-        transactions_df = transactions_df.rename(columns=rename_dict)
-        st.write(f"✅ Renamed columns: {rename_dict}")
-        
-        # Convert date columns to datetime
-        st.write("🔍 Converting date columns...")
-        if 'SERVICEDATE' in claims_df.columns:
-            claims_df['SERVICEDATE'] = pd.to_datetime(claims_df['SERVICEDATE'], errors='coerce')
-        
-        if 'FROMDATE' in transactions_df.columns:
-            transactions_df['FROMDATE'] = pd.to_datetime(transactions_df['FROMDATE'], errors='coerce')
-        st.write("✅ Date conversion complete")
+        # Load both datasets using requests to bypass Git LFS. The two are
+        # independent, so each is downloaded and parsed on its own thread
+        # (one file parses while the other is still downloading). Only the
+        # mapped columns are parsed, and dates are parsed during the read
+        # (any unparseable ones are coerced in sanitize_claims_data).
+        _debug("🔍 Loading claims and transactions CSVs from GitHub...")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            claims_df, transactions_df = pool.map(
+                _fetch_source_columns,
+                [claims_url, transactions_url],
+                [CLAIMS_SOURCE_COLUMNS, TRANSACTIONS_SOURCE_COLUMNS]
+            )
+        _debug(f"✅ Loaded claims: {claims_df.shape[0]} rows, {claims_df.shape[1]} cols")
+        _debug(f"✅ Loaded transactions: {transactions_df.shape[0]} rows, {transactions_df.shape[1]} cols")
         
         # Merge claims and transactions on Id/CLAIMID
-        st.write("🔍 Merging claims and transactions on Id/CLAIMID...")
-        st.write(f"   Claims Id unique: {claims_df['Id'].nunique()}")
-        st.write(f"   Transactions CLAIMID unique: {transactions_df['CLAIMID'].nunique()}")
-        
-        merged_df = pd.merge(
-            claims_df,
-            transactions_df,
-            left_on='Id',
-            right_on='CLAIMID',
+        if _debugging():
+            _debug(f"   Claims Id unique: {claims_df['Id'].nunique()}")
+            _debug(f"   Transactions CLAIMID unique: {transactions_df['CLAIMID'].nunique()}")
+        
+        # Index the (larger) transactions side on its key once and join
+        # claims against that index, keeping claims' row order
+        merged_df = claims_df.join(
+            transactions_df.set_index('CLAIMID', drop=False),
+            on='Id',
             how='left',
-            suffixes=('_claims', '_trans')  # Add suffixes to avoid conflicts
+            lsuffix='_claims',  # Add suffixes to avoid conflicts
+            rsuffix='_trans'
         )
-        st.write(f"✅ Merged data: {merged_df.shape[0]} rows")
-        st.write(f"   Merged columns: {list(merged_df.columns)[:15]}...")
-        
-        # Map to standardized columns
-        st.write("🔍 Mapping to standardized schema...")
-        st.write(f"   Available columns in merged data: {list(merged_df.columns)}")
+        _debug(f"✅ Merged data: {merged_df.shape[0]} rows")
+        _debug(f"   Merged columns: {list(merged_df.columns)}")
         
         # Handle both PATIENTID and PATIENTID_claims/trans variants
         # After merge with suffixes, columns are: PATIENTID_claims, PATIENTID_trans
         patient_id_col = 'PATIENTID_claims' if 'PATIENTID_claims' in merged_df.columns else 'PATIENTID'
         provider_id_col = 'PROVIDERID_claims' if 'PROVIDERID_claims' in merged_df.columns else 'PROVIDERID'
         
-        patient_id = merged_df[patient_id_col]
-        provider_id = merged_df[provider_id_col]
-        
-        # Get diagnosis code from claims (use DIAGNOSIS1 as primary)
-        if 'DIAGNOSIS1' in merged_df.columns:
-            diagnosis_col = merged_df['DIAGNOSIS1']
-        else:
-            diagnosis_col = pd.Series(['UNKNOWN'] * len(merged_df), index=merged_df.index)
-        
-        st.write(f"   diagnosis_col: {diagnosis_col.notna().sum()} non-null, {diagnosis_col.isna().sum()} null")
-        
-        # Get amount from transactions (may be AMOUNT or None after merge)
-        if 'AMOUNT' in merged_df.columns:
-            claim_amount = merged_df['AMOUNT'].fillna(0)
-        else:
-            claim_amount = pd.Series([0]*len(merged_df), index=merged_df.index)
-        
-        st.write(f"   claim_amount: {(claim_amount > 0).sum()} positive, {(claim_amount <= 0).sum()} zero/negative")
-        
-        # Get procedure code
-        if 'PROCEDURECODE' in merged_df.columns:
-            procedure_code = merged_df['PROCEDURECODE'].fillna('UNKNOWN')
-        else:
-            procedure_code = pd.Series(['UNKNOWN']*len(merged_df), index=merged_df.index)
-        
-        # Get date - prefer SERVICEDATE from claims, fallback to FROMDATE from transactions
-        if 'SERVICEDATE' in merged_df.columns:
-            date_col = merged_df['SERVICEDATE']
-        elif 'FROMDATE' in merged_df.columns:
-            date_col = merged_df['FROMDATE']
-        else:
-            date_col = pd.Series([pd.NaT]*len(merged_df), index=merged_df.index)
-        
-        # Map columns to our standard schema
-        # CRITICAL: Reset index to avoid alignment issues
-        standardized_df = pd.DataFrame({
-            'patient_id': patient_id.reset_index(drop=True).values,
-            'provider_id': provider_id.reset_index(drop=True).values,
-            'claim_amount': claim_amount.reset_index(drop=True).values,
-            'diagnosis_code': diagnosis_col.astype(str).fillna('UNKNOWN').reset_index(drop=True).values,
-            'procedure_code': procedure_code.reset_index(drop=True).values,
-            'date': date_col.reset_index(drop=True).values
-        })
-        
-        st.write(f"✅ Standardized schema: {standardized_df.shape}")
-        st.write(f"   Columns: {list(standardized_df.columns)}")
-        st.write(f"   Data types: {dict(standardized_df.dtypes)}")
-        st.write(f"   Null values before sanitization:")
-        st.write(f"     patient_id: {standardized_df['patient_id'].isna().sum()}")
-        st.write(f"     provider_id: {standardized_df['provider_id'].isna().sum()}")
-        st.write(f"     claim_amount: {standardized_df['claim_amount'].isna().sum()}")
-        st.write(f"     diagnosis_code: {standardized_df['diagnosis_code'].isna().sum()}")
-        st.write(f"     procedure_code: {standardized_df['procedure_code'].isna().sum()}")
+        # Source column for each standard column: diagnosis from claims
+        # (DIAGNOSIS1 as primary), amount and procedure from transactions,
+        # and date preferring SERVICEDATE from claims over FROMDATE
+        date_source = 'SERVICEDATE' if 'SERVICEDATE' in merged_df.columns else 'FROMDATE'
+        sources = {
+            patient_id_col: 'patient_id',
+            provider_id_col: 'provider_id',
+            'AMOUNT': 'claim_amount',
+            'DIAGNOSIS1': 'diagnosis_code',
+            'PROCEDURECODE': 'procedure_code',
+            date_source: 'date',
+        }
+        optional = {'AMOUNT', 'DIAGNOSIS1', 'PROCEDURECODE', date_source}
+        present = {
+            source: name for source, name in sources.items()
+            if source not in optional or source in merged_df.columns
+        }
         
-        # CRITICAL DEBUG: Show first 5 rows of actual data
-        st.write(f"   First 5 rows of standardized data:")
-        for idx in range(min(5, len(standardized_df))):
-            row = standardized_df.iloc[idx]
-            st.write(f"     Row {idx}: patient_id={row['patient_id']} (type={type(row['patient_id']).__name__}), " +
-                    f"provider_id={row['provider_id']} (type={type(row['provider_id']).__name__})")
+        # Map columns to our standard schema with one selection (a single
+        # copy), then give it a fresh index so rows never align on the
+        # merge's repeated claim index
+        standardized_df = merged_df[list(present)].rename(columns=present)
+        standardized_df.index = pd.RangeIndex(len(standardized_df))
+        
+        # Defaults for columns the source lacks, in standard column order
+        defaults = {'claim_amount': 0, 'diagnosis_code': 'UNKNOWN', 'procedure_code': 'UNKNOWN', 'date': pd.NaT}
+        for position, name in enumerate(sources.values()):
+            if name not in standardized_df.columns:
+                standardized_df.insert(position, name, defaults[name])
+        
+        standardized_df['claim_amount'] = standardized_df['claim_amount'].fillna(0)
+        standardized_df['diagnosis_code'] = standardized_df['diagnosis_code'].astype(str)
+        standardized_df['procedure_code'] = standardized_df['procedure_code'].fillna('UNKNOWN')
+        if isinstance(standardized_df['date'].dtype, pd.DatetimeTZDtype):
+            # Timestamps like '...Z' parse as UTC; store them naive (in UTC)
+            # so they compare with the naive dates used for filtering
+            standardized_df['date'] = standardized_df['date'].dt.tz_convert(None)
+        _debug(f"✅ Standardized schema: {standardized_df.shape}")
         
         # Data validation and sanitization
-        st.write("🔍 Sanitizing data...")
         standardized_df = sanitize_claims_data(standardized_df)
-        st.write(f"✅ Final data: {standardized_df.shape[0]} rows after sanitization")
+        _debug(f"✅ Final data: {standardized_df.shape[0]} rows after sanitization")
+        _write_cached_claims(claims_url, standardized_df)
         
         return standardized_df
         
     except Exception as e:
         st.error(f"❌ Could not load and merge claims data: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        st.error(f"🔍 Full error trace:\n{error_trace}")
+        logger.exception("Could not load and merge claims data")
+        if DEBUG:
+            import traceback
+            st.error(f"🔍 Full error trace:\n{traceback.format_exc()}")
         st.warning("Using generated sample data instead.")
-        print(f"\n\n⚠️  ERROR in load_claims_data: {str(e)}")
-        print(f"Traceback:\n{error_trace}\n\n")
         df = generate_sample_claims_data(num_records=1000)
         df = sanitize_claims_data(df)
         return df
@@ -266,131 +422,115 @@ def sanitize_claims_data(df: pd.DataFrame) -> pd.DataFrame:
     Validate and sanitize claims data for security and quality.
     
     Args:
-        df: Raw claims DataFrame
+        df: Raw claims DataFrame (not modified)
         
     Returns:
         Cleaned DataFrame
     """
-    # Make a copy to avoid SettingWithCopyWarning
-    df = df.copy()
+    # Shallow copy: every step below replaces whole columns or builds a new
+    # frame, so the caller's column buffers are never written to
+    df = df.copy(deep=False)
     
     initial_rows = len(df)
-    st.write(f"   📊 Starting sanitization: {initial_rows} rows")
-    st.write(f"   Columns present: {list(df.columns)}")
-    
-    # Check what we have BEFORE any transformation
-    st.write(f"   Initial null counts:")
-    for col in df.columns:
-        st.write(f"     • {col}: {df[col].isna().sum()} nulls, dtype={df[col].dtype}")
-    
-    # CRITICAL: Show sample values BEFORE conversion
-    st.write(f"   Sample values BEFORE conversion:")
-    for col in ['patient_id', 'provider_id', 'claim_amount']:
-        if col in df.columns:
-            samples = df[col].head(5).tolist()
-            types = [type(v).__name__ for v in samples]
-            st.write(f"     • {col}: {samples} (types: {types})")
-    
-    # Remove duplicate rows
-    df = df.drop_duplicates()
-    after_dedup = len(df)
-    st.write(f"   ✓ After drop_duplicates: {after_dedup} rows (removed {initial_rows - after_dedup})")
+    _debug(f"   📊 Starting sanitization: {initial_rows} rows")
+    
+    # Per-column null counts each scan a whole column, so only when debugging
+    if _debugging():
+        for col in df.columns:
+            _debug(f"     • {col}: {df[col].isna().sum()} nulls, dtype={df[col].dtype}")
     
     # For numeric fields: only convert if they're not already numeric
     numeric_cols = ['patient_id', 'provider_id', 'claim_amount']
     for col in numeric_cols:
-        if col in df.columns:
-            before_dtype = df[col].dtype
+        if col not in df.columns:
+            continue
+        
+        # Decide from the dtype first: numeric columns need nothing
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        
+        # CRITICAL: Don't try to convert UUIDs (strings) to numeric! Only the
+        # first value is checked, whatever the string-like dtype (object,
+        # string or categorical)
+        sample_val = str(df[col].iloc[0]) if len(df) > 0 else ""
+        if len(sample_val) == 36 and sample_val.count('-') == 4:
+            _debug(f"   • {col}: UUID string format, keeping as-is (not converting to numeric)")
+            continue
+        
+        # CRITICAL: Try conversion carefully
+        try:
             before_null = df[col].isna().sum()
-            
-            # CRITICAL: Don't try to convert UUIDs (strings) to numeric!
-            # Check if column contains UUIDs or other non-numeric data
-            if df[col].dtype == 'object':
-                # Sample a value to check if it looks like a UUID
-                sample_val = str(df[col].iloc[0]) if len(df) > 0 else ""
-                is_uuid = len(sample_val) == 36 and sample_val.count('-') == 4
-                
-                if is_uuid:
-                    st.write(f"   • {col}: UUID string format, keeping as-is (not converting to numeric)")
-                    continue
-            
-            # Check if already numeric
-            if df[col].dtype in ['int64', 'int32', 'float64', 'float32', 'int', 'float']:
-                st.write(f"   • {col}: already numeric ({df[col].dtype}), {before_null} nulls")
-            else:
-                st.write(f"   • {col}: converting from {df[col].dtype} to numeric...")
-                # Show what we're converting
-                sample_vals = df[col].head(10).unique()
-                st.write(f"     Sample values to convert: {sample_vals}")
-                
-                # CRITICAL: Try conversion carefully
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                    after_null = df[col].isna().sum()
-                    created_nulls = after_null - before_null
-                    if created_nulls > 0:
-                        st.error(f"     ⚠️  CONVERSION FAILED: Created {created_nulls} new NaNs!")
-                        st.write(f"     This means {created_nulls} values couldn't be parsed as numbers")
-                        # Show which values failed
-                        sample_failed = df[df[col].isna()][col].head(5).tolist()
-                        st.write(f"     Examples of values that failed: {sample_failed}")
-                    else:
-                        st.write(f"     ✓ Conversion successful: {after_null} nulls (was {before_null})")
-                except Exception as conversion_error:
-                    st.error(f"     ❌ CONVERSION ERROR: {str(conversion_error)}")
-    
-    after_numeric = len(df)
-    st.write(f"   ✓ After numeric handling: {after_numeric} rows")
-    st.write(f"   Null counts after numeric conversion:")
-    for col in numeric_cols:
-        if col in df.columns:
-            st.write(f"     • {col}: {df[col].isna().sum()} nulls")
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            created_nulls = df[col].isna().sum() - before_null
+            if created_nulls > 0:
+                logger.warning("%s: %d values could not be parsed as numbers", col, created_nulls)
+                if DEBUG:
+                    st.error(f"     ⚠️  CONVERSION FAILED: Created {created_nulls} new NaNs in {col}!")
+        except Exception as conversion_error:
+            logger.warning("%s: numeric conversion failed: %s", col, conversion_error)
+            if DEBUG:
+                st.error(f"     ❌ CONVERSION ERROR: {str(conversion_error)}")
+    
+    # Rows to keep, from every row-level check; the frame is sliced once
+    keep = np.ones(len(df), dtype=bool)
     
     # Drop rows with NaN in CRITICAL columns ONLY
     critical_cols = ['patient_id', 'provider_id']
     cols_to_check = [col for col in critical_cols if col in df.columns]
     
     if cols_to_check:
-        # Show what we're about to drop
-        null_mask = df[cols_to_check].isna().any(axis=1)
-        rows_with_nulls = null_mask.sum()
-        st.write(f"   ⚠️  Found {rows_with_nulls} rows with nulls in {cols_to_check}")
-        
-        if rows_with_nulls > 0:
-            # Show a sample of rows that will be dropped
-            sample_to_drop = df[null_mask].head(3)
-            st.write(f"     Sample rows to be dropped:")
-            for idx, row in sample_to_drop.iterrows():
-                st.write(f"       Row {idx}: patient_id={row.get('patient_id')}, provider_id={row.get('provider_id')}")
-        
-        before = len(df)
-        df = df.dropna(subset=cols_to_check)
-        after = len(df)
-        st.write(f"   ✓ After dropna: {after} rows (dropped {before - after})")
+        null_mask = df[cols_to_check].isna().any(axis=1).to_numpy()
+        if _debugging():
+            _debug(f"   ⚠️  Found {null_mask.sum()} rows with nulls in {cols_to_check}")
+        keep &= ~null_mask
+    
+    # Handle claim_amount: keep only >= 0, with NaN counting as 0 (NaN < 0
+    # is False, so the mask needs no filled copy of the full column)
+    if 'claim_amount' in df.columns:
+        keep &= ~(df['claim_amount'] < 0).to_numpy()
+    
+    # take() builds the filtered frame directly (no SettingWithCopy link back
+    # to the unfiltered one, so no defensive .copy() is needed)
+    df = df.take(np.flatnonzero(keep))
     
-    # Handle claim_amount: fill NaN with 0, then keep only >= 0
+    # Fill the missing amounts with 0 on the surviving rows only
     if 'claim_amount' in df.columns:
-        before = len(df)
-        null_count = df['claim_amount'].isna().sum()
-        st.write(f"   • claim_amount: {null_count} nulls before fillna")
         df['claim_amount'] = df['claim_amount'].fillna(0)
-        
-        negative_count = (df['claim_amount'] < 0).sum()
-        st.write(f"   • claim_amount: {negative_count} negative values")
-        
-        df = df[df['claim_amount'] >= 0].copy()
-        after = len(df)
-        st.write(f"   ✓ After claim_amount >= 0: {after} rows (dropped {before - after})")
+    _debug(f"   ✓ After row checks: {len(df)} rows (dropped {initial_rows - len(df)})")
     
-    # Convert date columns if present
-    if 'date' in df.columns:
+    # Convert date columns if present. Dates parsed on read (parse_dates) or
+    # generated as datetimes are already datetime64 and are left alone; text
+    # dates are parsed with the format pandas infers from the first value,
+    # which also accepts non-ISO uploads such as 01/31/2023
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
         df['date'] = pd.to_datetime(df['date'], errors='coerce')
     
+    # Remove duplicate claims, on the already filtered and converted frame.
+    # A duplicate is the same patient, provider, date and amount, so only
+    # those columns are hashed (not the free-text codes); the index is
+    # renumbered, matching what a cached Parquet reload returns.
+    before = len(df)
+    key_cols = [col for col in CLAIM_KEY_COLUMNS if col in df.columns]
+    df = df.drop_duplicates(subset=key_cols or None, ignore_index=True)
+    _debug(f"   ✓ After drop_duplicates: {len(df)} rows (removed {before - len(df)})")
+    
+    # Low-cardinality string columns are stored as categoricals: one code per
+    # row instead of a Python string, and cheaper grouping/unique counts
+    for col in ['patient_id', 'provider_id', 'diagnosis_code']:
+        if col in df.columns and df[col].dtype == 'object':
+            df[col] = df[col].astype('category')
+    
+    # High-cardinality free-text codes go to Arrow-backed strings, which are
+    # far more compact than Python str objects and hand off to st.dataframe
+    # without a conversion copy
+    if 'procedure_code' in df.columns and df['procedure_code'].dtype == 'object':
+        df['procedure_code'] = df['procedure_code'].astype('string[pyarrow]')
+    
     final_rows = len(df)
     retention_pct = 100 * final_rows / initial_rows if initial_rows > 0 else 0
-    st.write(f"   ✅ Sanitization complete: {final_rows} rows ({retention_pct:.1f}% retained)")
+    _debug(f"   ✅ Sanitization complete: {final_rows} rows ({retention_pct:.1f}% retained)")
     
-    # Debug: if we lost everything, show sample of original data
+    # If we lost everything, explain the likely causes
     if final_rows == 0 and initial_rows > 0:
         st.error("⚠️ CRITICAL: All rows removed during sanitization!")
         st.write("🔍 DIAGNOSIS:")
@@ -401,7 +541,7 @@ def sanitize_claims_data(df: pd.DataFrame) -> pd.DataFrame:
         st.write("")
         st.write("💡 SOLUTIONS:")
         st.write("   • Check that merge created PATIENTID_claims and PROVIDERID_claims columns")
-        st.write("   • Verify numeric conversion didn't create NaNs (check 'Sample values' above)")
+        st.write("   • Set the DEBUG_DATA_LOADER secret to see per-column details")
         st.write("   • If columns are strings like 'P123', they need stripping before conversion")
     
     return df
@@ -429,25 +569,34 @@ def filter_claims_by_parameters(
     Returns:
         Filtered DataFrame
     """
-    result = df.copy()
+    # Combine every condition into one mask so the frame is sliced only once
+    mask = np.ones(len(df), dtype=bool)
     
     if patient_ids:
-        result = result[result['patient_id'].isin(patient_ids)]
+        mask &= df['patient_id'].isin(patient_ids).to_numpy()
     
     if provider_ids:
-        result = result[result['provider_id'].isin(provider_ids)]
+        mask &= df['provider_id'].isin(provider_ids).to_numpy()
     
-    if date_range and 'date' in result.columns:
+    if date_range and 'date' in df.columns:
         start_date, end_date = date_range
-        result = result[(result['date'] >= start_date) & (result['date'] <= end_date)]
-    
-    if min_amount is not None:
-        result = result[result['claim_amount'] >= min_amount]
+        if pd.api.types.is_datetime64_dtype(df['date']):
+            # Compare the raw datetime64 values against datetime64 bounds
+            # rather than going through Series.between's Timestamp handling
+            dates = df['date'].to_numpy()
+            mask &= dates >= pd.Timestamp(start_date).to_datetime64()
+            mask &= dates <= pd.Timestamp(end_date).to_datetime64()
+        else:
+            mask &= df['date'].between(start_date, end_date).to_numpy()
     
-    if max_amount is not None:
-        result = result[result['claim_amount'] <= max_amount]
+    if min_amount is not None or max_amount is not None:
+        amounts = df['claim_amount'].to_numpy()
+        if min_amount is not None:
+            mask &= amounts >= min_amount
+        if max_amount is not None:
+            mask &= amounts <= max_amount
     
-    return result
+    return df[mask]
 
 
 def get_statistics(df: pd.DataFrame) -> dict:
@@ -463,14 +612,33 @@ def get_statistics(df: pd.DataFrame) -> dict:
     if df.empty:
         return {}
     
+    # Amount statistics straight from the ndarray (NaN skipped, as pandas
+    # does): sum gives the mean, one centered dot product gives the sample
+    # std, and the median is a partition rather than a full sort
+    amounts = df['claim_amount'].to_numpy(dtype=np.float64)
+    amounts = amounts[~np.isnan(amounts)]
+    count = amounts.size
+    total = amounts.sum()
+    
+    if count > 0:
+        mean = total / count
+        centered = amounts - mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.dot(centered, centered) / (count - 1))
+        median, min_claim, max_claim = np.median(amounts), amounts.min(), amounts.max()
+    else:
+        mean = std = median = min_claim = max_claim = np.nan
+    
+    unique_ids = df[['patient_id', 'provider_id']].nunique()
+    
     return {
         'total_claims': len(df),
-        'total_amount': df['claim_amount'].sum(),
-        'avg_claim': df['claim_amount'].mean(),
-        'median_claim': df['claim_amount'].median(),
-        'min_claim': df['claim_amount'].min(),
-        'max_claim': df['claim_amount'].max(),
-        'std_dev': df['claim_amount'].std(),
-        'unique_patients': df['patient_id'].nunique(),
-        'unique_providers': df['provider_id'].nunique(),
+        'total_amount': total,
+        'avg_claim': mean,
+        'median_claim': median,
+        'min_claim': min_claim,
+        'max_claim': max_claim,
+        'std_dev': std,
+        'unique_patients': unique_ids['patient_id'],
+        'unique_providers': unique_ids['provider_id'],
     }
@@ -3,14 +3,40 @@ GPT Integration module for HealthClaim Analytics Hub
 Handles OpenAI API interactions and prompt generation
 """
 
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from collections import OrderedDict
 import streamlit as st
 import pandas as pd
-from typing import Optional
-from openai import OpenAI, AuthenticationError, RateLimitError, APITimeoutError
+from typing import List, Optional
+from openai import OpenAI, AsyncOpenAI, AuthenticationError, RateLimitError, APITimeoutError
 
+# Upper bound on in-flight requests when explaining many claims at once
+MAX_CONCURRENT_REQUESTS = 10
 
-def initialize_openai():
-    """Initialize OpenAI API with credentials from Streamlit secrets."""
+# Claim explanations kept for reuse, and for how long (seconds)
+EXPLANATION_CACHE_SIZE = 1000
+EXPLANATION_CACHE_TTL = 86400
+
+ANOMALY_SYSTEM_PROMPT = "You are a healthcare fraud analyst providing concise, actionable insights."
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _openai_client(api_key: str) -> OpenAI:
+    """
+    Build the OpenAI client once and share it across calls and reruns.
+    
+    Keyed on the API key, so a rotated key gets a fresh client. The client
+    keeps its HTTP connection pool alive between requests.
+    """
+    return OpenAI(api_key=api_key)
+
+
+def _api_key() -> Optional[str]:
+    """Read the OpenAI API key from Streamlit secrets, or report it missing."""
     if "OPENAI_API_KEY" not in st.secrets:
         st.error(
             "⚠️ Please add your OpenAI API key to Streamlit secrets as 'OPENAI_API_KEY'. "
@@ -18,39 +44,69 @@ def initialize_openai():
         )
         return None
     
-    api_key = st.secrets["OPENAI_API_KEY"]
+    return st.secrets["OPENAI_API_KEY"]
+
+
+def initialize_openai():
+    """Initialize OpenAI API with credentials from Streamlit secrets."""
+    api_key = _api_key()
+    if api_key is None:
+        return None
     
     try:
-        client = OpenAI(api_key=api_key)
-        return client
+        return _openai_client(api_key)
     except Exception as e:
         st.error(f"❌ Failed to initialize OpenAI client: {str(e)}")
         return None
 
 
-def generate_anomaly_explanation(
-    claim_row: pd.Series,
-    context: Optional[str] = None,
-    model: str = "gpt-4",
-    max_tokens: int = 250
-) -> Optional[str]:
+def initialize_async_openai():
     """
-    Generate natural language explanation for an anomalous claim using GPT.
+    Initialize an async OpenAI client with credentials from Streamlit secrets.
     
-    Args:
-        claim_row: Pandas Series with claim data
-        context: Additional context about the claim or dataset
-        model: OpenAI model to use (gpt-4, gpt-3.5-turbo, etc.)
-        max_tokens: Maximum tokens in response
-        
-    Returns:
-        Explanation text or None if API fails
+    Unlike the sync client this one is not cached: its connections belong
+    to the event loop it first runs on, and every asyncio.run() starts a
+    new loop, so callers build one per batch and close it afterwards.
     """
-    client = initialize_openai()
-    if client is None:
+    api_key = _api_key()
+    if api_key is None:
         return None
     
-    # Build prompt with claim information
+    try:
+        return AsyncOpenAI(api_key=api_key)
+    except Exception as e:
+        st.error(f"❌ Failed to initialize OpenAI client: {str(e)}")
+        return None
+
+
+def _report_api_error(error: Exception, failure: str = "❌ Error calling OpenAI API") -> None:
+    """
+    Show an OpenAI API error in the app.
+    
+    Args:
+        error: Exception raised by the API call
+        failure: Message prefix for errors without a dedicated message
+    """
+    if isinstance(error, AuthenticationError):
+        st.error("❌ Authentication failed. Please check your OpenAI API key.")
+    elif isinstance(error, RateLimitError):
+        st.warning("⚠️ Rate limit reached. Please try again in a moment.")
+    elif isinstance(error, APITimeoutError):
+        st.error("❌ Request timed out. Please try again.")
+    else:
+        st.error(f"{failure}: {str(error)}")
+
+
+def _explanation_messages(prompt: str) -> List[dict]:
+    """Chat messages asking for an explanation of one claim prompt."""
+    return [
+        {"role": "system", "content": ANOMALY_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _build_anomaly_prompt(claim_row: pd.Series, context: Optional[str] = None) -> str:
+    """Build the user prompt describing a single claim for explanation."""
     prompt_lines = [
         "You are a healthcare fraud detection expert. Analyze this claim for potential fraud, waste, or abuse (FWA):",
         f"- Patient ID: {claim_row.get('patient_id', 'N/A')}",
@@ -73,39 +129,328 @@ def generate_anomaly_explanation(
         "Provide specific reasons and recommend investigation priority."
     )
     
-    prompt = "\n".join(prompt_lines)
+    return "\n".join(prompt_lines)
+
+
+class _ExplanationCache:
+    """
+    Bounded, thread-safe TTL store of claim explanations.
+    
+    Keys are (prompt, model, max_tokens). The prompt is built from the
+    claim's fields (and any context), so it identifies the claim: reruns
+    asking about the same suspicious row reuse the answer instead of paying
+    for another call. Once full, the least recently used entry is evicted.
+    """
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple) -> Optional[str]:
+        """Return the stored explanation, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, explanation = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return explanation
+    
+    def set(self, key: tuple, explanation: str) -> None:
+        """Store an explanation, evicting the oldest entry when full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), explanation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource(show_spinner=False)
+def _explanation_cache() -> _ExplanationCache:
+    """The process-wide explanation store, shared by every session."""
+    return _ExplanationCache(EXPLANATION_CACHE_SIZE, EXPLANATION_CACHE_TTL)
+
+
+def _get_cached_explanation(prompt: str, model: str, max_tokens: int) -> Optional[str]:
+    """Return the cached explanation for a prompt, or None without one."""
+    return _explanation_cache().get((prompt, model, max_tokens))
+
+
+def _set_cached_explanation(prompt: str, model: str, max_tokens: int, explanation: str) -> None:
+    """Cache a successful explanation for later calls with the same prompt."""
+    _explanation_cache().set((prompt, model, max_tokens), explanation)
+
+
+def _request_explanation(client: OpenAI, prompt: str, model: str, max_tokens: int) -> str:
+    """Ask the chat completions API to explain one claim prompt."""
+    response = client.chat.completions.create(
+        model=model,
+        messages=_explanation_messages(prompt),
+        temperature=0.7,
+        max_tokens=max_tokens,
+        timeout=30
+    )
+    
+    return response.choices[0].message.content
+
+
+def generate_anomaly_explanation(
+    claim_row: pd.Series,
+    context: Optional[str] = None,
+    model: str = "gpt-4",
+    max_tokens: int = 250
+) -> Optional[str]:
+    """
+    Generate natural language explanation for an anomalous claim using GPT.
+    
+    Args:
+        claim_row: Pandas Series with claim data
+        context: Additional context about the claim or dataset
+        model: OpenAI model to use (gpt-4, gpt-3.5-turbo, etc.)
+        max_tokens: Maximum tokens in response
+        
+    Returns:
+        Explanation text or None if API fails
+    """
+    client = initialize_openai()
+    if client is None:
+        return None
+    
+    # Build prompt with claim information
+    prompt = _build_anomaly_prompt(claim_row, context)
+    
+    explanation = _get_cached_explanation(prompt, model, max_tokens)
+    if explanation is not None:
+        return explanation
     
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a healthcare fraud analyst providing concise, actionable insights."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=max_tokens,
-            timeout=30
-        )
+        explanation = _request_explanation(client, prompt, model, max_tokens)
+        # Failed calls raise before this point, so they are never cached
+        _set_cached_explanation(prompt, model, max_tokens, explanation)
+        return explanation
+        
+    except Exception as e:
+        _report_api_error(e)
+        return None
+
+
+async def generate_anomaly_explanation_async(
+    client: AsyncOpenAI,
+    claim_row: pd.Series,
+    context: Optional[str] = None,
+    model: str = "gpt-4",
+    max_tokens: int = 250,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> Optional[str]:
+    """
+    Async variant of generate_anomaly_explanation for concurrent batches.
+    
+    Args:
+        client: Shared AsyncOpenAI client
+        claim_row: Pandas Series with claim data
+        context: Additional context about the claim or dataset
+        model: OpenAI model to use
+        max_tokens: Maximum tokens in response
+        semaphore: Optional semaphore capping concurrent requests
+        
+    Returns:
+        Explanation text or None if API fails
+    """
+    prompt = _build_anomaly_prompt(claim_row, context)
+    
+    try:
+        async with semaphore or contextlib.nullcontext():
+            response = await client.chat.completions.create(
+                model=model,
+                messages=_explanation_messages(prompt),
+                temperature=0.7,
+                max_tokens=max_tokens,
+                timeout=30
+            )
         
         return response.choices[0].message.content
         
-    except AuthenticationError:
-        st.error("❌ Authentication failed. Please check your OpenAI API key.")
+    except Exception as e:
+        _report_api_error(e)
         return None
-    except RateLimitError:
-        st.warning("⚠️ Rate limit reached. Please try again in a moment.")
+
+
+def generate_anomaly_explanations(
+    claim_rows: List[pd.Series],
+    context: Optional[str] = None,
+    model: str = "gpt-4",
+    max_tokens: int = 250,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS
+) -> List[Optional[str]]:
+    """
+    Explain several anomalous claims concurrently.
+    
+    Requests are issued in parallel over one async client shared by this
+    call's requests (a fresh one per call, see initialize_async_openai), so
+    total latency tracks the slowest request instead of the sum of them.
+    Claims already explained (same prompt, model and length) are answered
+    from the same cache as generate_anomaly_explanation and not requested.
+    
+    Args:
+        claim_rows: Claims to explain
+        context: Additional context shared by all claims
+        model: OpenAI model to use
+        max_tokens: Maximum tokens per response
+        max_concurrency: Maximum number of in-flight requests
+        
+    Returns:
+        List of explanations (None for failed requests), in input order
+    """
+    client = initialize_async_openai()
+    if client is None:
+        return [None] * len(claim_rows)
+    
+    prompts = [_build_anomaly_prompt(row, context) for row in claim_rows]
+    results = [_get_cached_explanation(prompt, model, max_tokens) for prompt in prompts]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if not misses:
+        return results
+    
+    async def _explain_all():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        async with client:
+            return await asyncio.gather(*[
+                generate_anomaly_explanation_async(
+                    client, claim_rows[i], context=context, model=model,
+                    max_tokens=max_tokens, semaphore=semaphore
+                )
+                for i in misses
+            ])
+    
+    for i, explanation in zip(misses, asyncio.run(_explain_all())):
+        results[i] = explanation
+        if explanation is not None:
+            # Store the reply so later calls for this claim are cache hits
+            _set_cached_explanation(prompts[i], model, max_tokens, explanation)
+    
+    return results
+
+
+def submit_anomaly_batch(
+    anomalies_df: pd.DataFrame,
+    context: Optional[str] = None,
+    model: str = "gpt-4",
+    max_tokens: int = 250
+) -> Optional[str]:
+    """
+    Queue explanations for many anomalous claims via the OpenAI Batch API.
+    
+    Batch requests cost half as much as real-time calls and use a separate
+    rate-limit pool, in exchange for a turnaround of up to 24 hours.
+    
+    Args:
+        anomalies_df: Anomalous claims to explain (one request per row)
+        context: Additional context shared by all claims
+        model: OpenAI model to use
+        max_tokens: Maximum tokens per response
+        
+    Returns:
+        Batch ID to poll with retrieve_anomaly_batch, or None if submission fails
+    """
+    client = initialize_openai()
+    if client is None:
         return None
-    except APITimeoutError:
-        st.error("❌ Request timed out. Please try again.")
+    
+    # One JSONL line per claim; custom_id maps results back to the frame index
+    lines = []
+    for idx, claim_row in anomalies_df.iterrows():
+        lines.append(json.dumps({
+            "custom_id": str(idx),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": _explanation_messages(_build_anomaly_prompt(claim_row, context)),
+                "temperature": 0.7,
+                "max_tokens": max_tokens,
+            },
+        }))
+    
+    try:
+        batch_file = client.files.create(
+            file=("anomaly_explanations.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+        
+    except Exception as e:
+        _report_api_error(e, "Error submitting batch")
         return None
+
+
+def retrieve_anomaly_batch(batch_id: str) -> Optional[dict]:
+    """
+    Poll a batch created by submit_anomaly_batch.
+    
+    Args:
+        batch_id: ID returned by submit_anomaly_batch
+        
+    Returns:
+        Dictionary with the batch 'status', 'explanations' (custom_id ->
+        text) and 'failed' (custom_ids of requests that got no explanation),
+        the last two populated once the batch has completed; or None if
+        polling fails
+    """
+    client = initialize_openai()
+    if client is None:
+        return None
+    
+    try:
+        batch = client.batches.retrieve(batch_id)
+        
+        explanations = {}
+        failed = []
+        if batch.status == "completed":
+            # Successful lines land in the output file; requests that
+            # errored outright are written to a separate error file
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    _parse_batch_output(client.files.content(file_id).text, explanations, failed)
+        
+        return {"status": batch.status, "explanations": explanations, "failed": failed}
+        
     except Exception as e:
-        st.error(f"❌ Error calling OpenAI API: {str(e)}")
+        _report_api_error(e, "Error retrieving batch")
         return None
 
 
+def _parse_batch_output(text: str, explanations: dict, failed: List[str]) -> None:
+    """
+    Sort Batch API result lines into explanations and failed requests.
+    
+    Args:
+        text: JSONL contents of a batch output or error file
+        explanations: Filled with custom_id -> explanation for 200 replies
+        failed: Extended with the custom_ids of every other line
+    """
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") == 200:
+            explanations[record["custom_id"]] = (
+                response["body"]["choices"][0]["message"]["content"]
+            )
+        else:
+            failed.append(record["custom_id"])
+
+
 def generate_network_insights(
     network_stats: dict,
     suspicious_clusters: dict,
@@ -179,17 +524,8 @@ Be specific and actionable in your response."""
         
         return response.choices[0].message.content
         
-    except AuthenticationError:
-        st.error("❌ Authentication failed. Please check your OpenAI API key.")
-        return None
-    except RateLimitError:
-        st.warning("⚠️ Rate limit reached. Please try again in a moment.")
-        return None
-    except APITimeoutError:
-        st.error("❌ Request timed out. Please try again.")
-        return None
     except Exception as e:
-        st.error(f"Error generating network insights: {str(e)}")
+        _report_api_error(e, "Error generating network insights")
         return None
 
 
@@ -240,17 +576,8 @@ explain what additional information would be needed."""
         
         return response.choices[0].message.content
         
-    except AuthenticationError:
-        st.error("❌ Authentication failed. Please check your OpenAI API key.")
-        return None
-    except RateLimitError:
-        st.warning("⚠️ Rate limit reached. Please try again in a moment.")
-        return None
-    except APITimeoutError:
-        st.error("❌ Request timed out. Please try again.")
-        return None
     except Exception as e:
-        st.error(f"Error answering question: {str(e)}")
+        _report_api_error(e, "Error answering question")
         return None
 
 
@@ -273,9 +600,9 @@ def validate_api_connection(verbose: bool = True) -> bool:
         
         api_key = st.secrets.get("OPENAI_API_KEY", "")
         
-        # Create client directly
+        # Reuse the shared client (built once per API key)
         try:
-            client = OpenAI(api_key=api_key)
+            client = _openai_client(api_key)
         except Exception as e:
             if verbose:
                 st.error(f"❌ Failed to initialize OpenAI client: {str(e)}")
@@ -3,15 +3,29 @@ Logging module for HealthClaim Analytics Hub
 Provides centralized logging configuration and utilities
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
-from typing import Optional
+import threading
+from types import CodeType
+from typing import Dict, List, Optional, Set
 from pathlib import Path
 
 # Log format
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# LOG_FORMAT never shows thread/process details or the call site, so don't
+# collect them for every record. These switches are process-wide: records
+# from every logger, third-party ones included, get None for %(threadName)s
+# and %(process)d, and "(unknown function)"/0 for %(funcName)s/%(lineno)d
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging._srcfile = None
+
 # Log levels
 LOG_LEVELS = {
     "DEBUG": logging.DEBUG,
@@ -21,6 +35,99 @@ LOG_LEVELS = {
     "CRITICAL": logging.CRITICAL,
 }
 
+# Loggers resolved by get_logger(), keyed by the calling code object
+_caller_loggers: Dict[CodeType, logging.Logger] = {}
+
+# Names of loggers already configured by setup_logger(), guarded by a lock
+# since Streamlit sessions run their scripts on separate threads
+_configured: Set[str] = set()
+_setup_lock = threading.Lock()
+
+# Background listeners draining each configured logger's queue
+_listeners: List[logging.handlers.QueueListener] = []
+
+
+def _stop_listeners() -> None:
+    """Flush and stop all queue listeners (registered with atexit)."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(_stop_listeners)
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Formatter that reuses the asctime string within the same second.
+    
+    DATE_FORMAT has one-second resolution, so records logged in the same
+    second share one strftime call.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last_time = (None, "")
+    
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        second = int(record.created)
+        last_second, last_asctime = self._last_time
+        if second != last_second:
+            last_asctime = super().formatTime(record, datefmt)
+            self._last_time = (second, last_asctime)
+        return last_asctime
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    File handler that batches writes in a large buffer.
+    
+    Records are not flushed one by one; a background thread flushes every
+    ``flush_interval`` seconds, and ERROR or higher records are flushed
+    immediately so they survive a crash.
+    """
+    
+    def __init__(
+        self,
+        filename: Path,
+        flush_interval: float = 0.5,
+        buffer_size: int = 1 << 16,
+        encoding: Optional[str] = None
+    ):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        super().__init__(filename, encoding=encoding)
+        self._stop_flushing = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_periodically, name="log-flush", daemon=True
+        )
+        self._flusher.start()
+    
+    def _open(self):
+        return open(
+            self.baseFilename, self.mode, buffering=self.buffer_size,
+            encoding=self.encoding, errors=self.errors
+        )
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+    
+    def _flush_periodically(self) -> None:
+        while not self._stop_flushing.wait(self.flush_interval):
+            self.flush()
+    
+    def close(self) -> None:
+        self._stop_flushing.set()
+        super().close()
+
 
 def setup_logger(
     name: str = "healthclaim",
@@ -31,6 +138,9 @@ def setup_logger(
     """
     Set up and configure a logger instance.
     
+    Records are handed to a queue and written by a background listener
+    thread, so logging calls never block on console or file I/O.
+    
     Args:
         name: Logger name (typically module name)
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -42,31 +152,62 @@ def setup_logger(
     """
     logger = logging.getLogger(name)
     
-    # Avoid adding handlers multiple times
-    if logger.handlers:
-        return logger
+    with _setup_lock:
+        # Avoid adding handlers multiple times
+        if name in _configured or logger.handlers:
+            return logger
+        _configure_logger(logger, level, log_file, stream)
+        _configured.add(name)
+    
+    return logger
+
+
+def _configure_logger(
+    logger: logging.Logger,
+    level: str,
+    log_file: Optional[Path],
+    stream: bool
+) -> None:
+    """
+    Attach the queue handler and its listener to a new logger.
     
-    logger.setLevel(LOG_LEVELS.get(level.upper(), logging.INFO))
+    Args:
+        logger: Logger to configure
+        level: Logging level name
+        log_file: Optional path to log file
+        stream: Whether to log to stdout
+    """
+    log_level = LOG_LEVELS.get(level.upper(), logging.INFO)
+    logger.setLevel(log_level)
     
     # Create formatter
-    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+    formatter = CachedTimeFormatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+    handlers = []
     
     # Console handler
     if stream:
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(LOG_LEVELS.get(level.upper(), logging.INFO))
+        console_handler.setLevel(log_level)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
     # File handler (if specified)
     if log_file:
         log_file.parent.mkdir(parents=True, exist_ok=True)
-        file_handler = logging.FileHandler(log_file)
+        file_handler = BufferedFileHandler(log_file)
         file_handler.setLevel(logging.DEBUG)  # File gets all logs
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
     
-    return logger
+    # Route records through a queue to the real handlers
+    if handlers:
+        log_queue = queue.Queue(-1)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        listener.start()
+        _listeners.append(listener)
 
 
 def get_logger(name: Optional[str] = None) -> logging.Logger:
@@ -80,12 +221,17 @@ def get_logger(name: Optional[str] = None) -> logging.Logger:
         Logger instance
     """
     if name is None:
-        import inspect
-        frame = inspect.currentframe()
-        if frame and frame.f_back:
-            name = frame.f_back.f_globals.get("__name__", "healthclaim")
-        else:
-            name = "healthclaim"
+        # sys._getframe skips the FrameInfo objects inspect would build, and
+        # each call site only has to be resolved once
+        try:
+            frame = sys._getframe(1)
+        except ValueError:
+            return logging.getLogger("healthclaim")
+        logger = _caller_loggers.get(frame.f_code)
+        if logger is None:
+            logger = logging.getLogger(frame.f_globals.get("__name__", "healthclaim"))
+            _caller_loggers[frame.f_code] = logger
+        return logger
     
     return logging.getLogger(name)
 
@@ -4,11 +4,23 @@ Handles creation and visualization of patient-provider networks
 """
 
 import pandas as pd
+import numpy as np
 import networkx as nx
+from collections import defaultdict
+from itertools import combinations, islice
 import plotly.graph_objects as go
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
 import streamlit as st
 
+# Above this many nodes the spring layout runs fewer iterations
+LARGE_LAYOUT_NODES = 2000
+
+# Above this many nodes node labels are left to the hover text
+MAX_LABELED_NODES = 500
+
+# Cap on maximal cliques enumerated per core component
+MAX_CLIQUES_PER_COMPONENT = 10_000
+
 
 def build_patient_provider_network(df: pd.DataFrame) -> nx.Graph:
     """
@@ -22,46 +34,149 @@ def build_patient_provider_network(df: pd.DataFrame) -> nx.Graph:
     """
     G = nx.Graph()
     
-    for _, row in df.iterrows():
-        # Handle both numeric IDs and UUID strings
-        patient_id = row['patient_id']
-        provider_id = row['provider_id']
-        
-        # Convert to string for node naming (works for both int and UUID)
-        try:
-            patient_node = f"Patient_{int(patient_id)}"
-        except (ValueError, TypeError):
-            # If it's a UUID or non-numeric string, use it directly
-            patient_node = f"Patient_{str(patient_id)[:8]}"  # Use first 8 chars of UUID
+    # Everything below works on integer node codes; names are only looked
+    # up once per node and once per distinct edge
+    patient_codes, patient_names = _node_codes(df['patient_id'], 'Patient')
+    provider_codes, provider_names = _node_codes(df['provider_id'], 'Provider')
+    num_patients = len(patient_names)
+    names = np.concatenate([patient_names, provider_names])
+    
+    # Nodes in first-seen order, alternating patient/provider as they appear
+    interleaved = np.column_stack([patient_codes, provider_codes + num_patients]).ravel()
+    G.add_nodes_from(
+        (names[code], {'node_type': 'patient' if code < num_patients else 'provider'})
+        for code in pd.unique(interleaved)
+    )
+    
+    # Repeat claims between the same pair collapse into one weighted edge
+    edges = (
+        pd.DataFrame({
+            'patient': patient_codes,
+            'provider': provider_codes,
+            'claim_amount': df['claim_amount'].to_numpy(dtype=np.float64, na_value=np.nan),
+        })
+        .groupby(['patient', 'provider'], sort=False)['claim_amount']
+        .agg(['sum', 'size'])
+    )
+    G.add_edges_from(
+        (patient, provider, {'claim_amount': amount, 'count': count})
+        for patient, provider, amount, count in zip(
+            patient_names[edges.index.get_level_values('patient')],
+            provider_names[edges.index.get_level_values('provider')],
+            edges['sum'].tolist(),
+            edges['size'].tolist()
+        )
+    )
+    
+    return G
+
+
+def _node_codes(ids: pd.Series, prefix: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Factorize an ID column into integer codes and per-code node names.
+    
+    Each distinct ID is formatted only once.
+    
+    Args:
+        ids: Patient or provider ID column (numeric or UUID strings)
+        prefix: Node name prefix, e.g. 'Patient'
         
+    Returns:
+        Tuple of (codes aligned with ``ids``, node name for each code)
+    """
+    codes, uniques = pd.factorize(ids, use_na_sentinel=False)
+    
+    if pd.api.types.is_integer_dtype(uniques.dtype):
+        # Integer IDs format in one vectorized call and can't share a name
+        names = np.char.add(f"{prefix}_", np.asarray(uniques.astype(str), dtype=str))
+        return codes, names.astype(object)
+    
+    names = []
+    for value in uniques:
         try:
-            provider_node = f"Provider_{int(provider_id)}"
+            names.append(f"{prefix}_{int(value)}")
         except (ValueError, TypeError):
-            # If it's a UUID or non-numeric string, use it directly
-            provider_node = f"Provider_{str(provider_id)[:8]}"  # Use first 8 chars of UUID
+            # UUID or other non-numeric ID: use its first 8 chars
+            names.append(f"{prefix}_{str(value)[:8]}")
+    
+    # Distinct IDs can share a name (UUIDs with the same first 8 chars);
+    # re-code by name so they still collapse into one node
+    name_codes, unique_names = pd.factorize(np.array(names, dtype=object))
+    return name_codes[codes], unique_names
+
+
+def compute_network_layout(
+    G: nx.Graph,
+    seed: int = 42,
+    engine: str = 'networkx'
+) -> Dict:
+    """
+    Compute node positions for the network visualization.
+    
+    The force-directed layout is the most expensive step of rendering, so
+    callers should compute it once per graph and pass it to
+    create_network_visualization via ``pos``.
+    
+    Graphs of 500+ nodes go through NetworkX's sparse (SciPy) solver on
+    their own; above LARGE_LAYOUT_NODES the iteration count is also cut,
+    since each iteration's cost grows with the node count.
+    
+    Args:
+        G: NetworkX Graph object
+        seed: Random seed for a reproducible layout
+        engine: 'networkx', or 'igraph' to run Fruchterman-Reingold with
+            igraph's C implementation when python-igraph is installed
+            (falls back to networkx otherwise)
         
-        # Add nodes with type attribute
-        G.add_node(patient_node, node_type='patient')
-        G.add_node(provider_node, node_type='provider')
+    Returns:
+        Dictionary mapping node name to (x, y) coordinates
+    """
+    if engine == 'igraph':
+        pos = _igraph_layout(G, seed)
+        if pos is not None:
+            return pos
+    
+    iterations = 50 if G.number_of_nodes() <= LARGE_LAYOUT_NODES else 20
+    return nx.spring_layout(G, k=0.2, iterations=iterations, seed=seed)
+
+
+def _igraph_layout(G: nx.Graph, seed: int) -> Optional[Dict]:
+    """
+    Compute a Fruchterman-Reingold layout with python-igraph, if installed.
+    
+    Args:
+        G: NetworkX Graph object
+        seed: Random seed for the starting positions
         
-        # Add edge with claim amount as weight
-        claim_amount = float(row['claim_amount'])
-        if G.has_edge(patient_node, provider_node):
-            # If edge exists, increment the weight
-            G[patient_node][provider_node]['claim_amount'] += claim_amount
-            G[patient_node][provider_node]['count'] += 1
-        else:
-            G.add_edge(patient_node, provider_node, 
-                      claim_amount=claim_amount, count=1)
+    Returns:
+        Dictionary mapping node name to (x, y) coordinates, or None
+        without igraph
+    """
+    converted = _to_igraph(G)
+    if converted is None:
+        return None
+    _, ig, nodes = converted
+    if not nodes:
+        return {}
     
-    return G
+    # Seeded starting positions; igraph's process-wide generator is left
+    # alone, since sessions lay out graphs on separate threads. They span
+    # igraph's own default of sqrt(n) across: a cramped start makes the
+    # first iterations crawl on large graphs
+    half_width = np.sqrt(len(nodes)) / 2
+    start = np.random.default_rng(seed).uniform(-half_width, half_width, (len(nodes), 2))
+    coords = ig.layout_fruchterman_reingold(seed=start.tolist())
+    
+    # Rescale to NetworkX's [-1, 1] range so either engine plots alike
+    return nx.rescale_layout_dict(dict(zip(nodes, np.array(coords.coords))))
 
 
 def create_network_visualization(
     G: nx.Graph,
     node_size_scale: float = 1.0,
     edge_width_scale: float = 1.0,
-    title: str = "Patient-Provider Network"
+    title: str = "Patient-Provider Network",
+    pos: Optional[Dict] = None
 ) -> go.Figure:
     """
     Create an interactive Plotly visualization of the network.
@@ -71,68 +186,70 @@ def create_network_visualization(
         node_size_scale: Scale factor for node sizes
         edge_width_scale: Scale factor for edge widths
         title: Title for the visualization
+        pos: Precomputed node positions (see compute_network_layout)
         
     Returns:
         Plotly Figure object
     """
-    # Calculate layout
-    pos = nx.spring_layout(G, k=0.2, iterations=50, seed=42)
-    
-    # Extract edge information
-    edge_x = []
-    edge_y = []
-    edge_weights = []
-    
-    for edge in G.edges(data=True):
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-        # Store weight for tooltip
-        edge_weights.append(edge[2].get('claim_amount', 0))
-    
-    # Create edge trace
-    edge_trace = go.Scatter(
-        x=edge_x,
-        y=edge_y,
+    # Calculate layout unless the caller already has one
+    if pos is None:
+        pos = compute_network_layout(G)
+    
+    # Coordinates go to Plotly as float32 arrays, which are shipped to the
+    # browser as compact base64 typed arrays rather than JSON number lists
+    nodes = list(G.nodes())
+    node_xy = np.array([pos[node] for node in nodes], dtype=np.float32).reshape(-1, 2)
+    node_index = {node: i for i, node in enumerate(nodes)}
+    
+    # Extract edge information: one (start, end, NaN) triple per edge, the
+    # NaN breaking the line between consecutive edges
+    edge_ends = np.array(
+        [(node_index[u], node_index[v]) for u, v in G.edges()], dtype=np.intp
+    ).reshape(-1, 2)
+    edge_x = np.full((len(edge_ends), 3), np.nan, dtype=np.float32)
+    edge_y = np.full((len(edge_ends), 3), np.nan, dtype=np.float32)
+    edge_x[:, :2] = node_xy[edge_ends, 0]
+    edge_y[:, :2] = node_xy[edge_ends, 1]
+    
+    # Create edge trace (WebGL keeps large edge sets off the SVG DOM)
+    edge_trace = go.Scattergl(
+        x=edge_x.ravel(),
+        y=edge_y.ravel(),
         mode='lines',
         line=dict(width=0.5 * edge_width_scale, color='#888'),
         hoverinfo='none',
         showlegend=False
     )
     
-    # Extract node information
-    node_x = []
-    node_y = []
-    node_color = []
-    node_size = []
-    node_text = []
-    node_degree = dict(G.degree())
-    
-    for node in G.nodes(data=True):
-        x, y = pos[node[0]]
-        node_x.append(x)
-        node_y.append(y)
-        
-        # Color by node type
-        if node[1]['node_type'] == 'patient':
-            node_color.append('#1f77b4')  # Blue for patients
-        else:
-            node_color.append('#ff7f0e')  # Orange for providers
-        
-        # Size by degree (number of connections)
-        degree = node_degree[node[0]]
-        node_size.append(10 + degree * 2 * node_size_scale)
-        
-        # Hover text with connection count
-        node_text.append(f"{node[0]}<br>Connections: {degree}")
-    
-    # Create node trace
-    node_trace = go.Scatter(
-        x=node_x,
-        y=node_y,
-        mode='markers+text',
-        text=[node.split('_')[0] + '<br>' + node.split('_')[1] for node in G.nodes()],
+    # Extract node information, in the same order as ``nodes``
+    is_patient = np.fromiter(
+        (node_type == 'patient' for _, node_type in G.nodes(data='node_type')),
+        dtype=bool, count=len(nodes)
+    )
+    node_degree = np.fromiter(
+        (degree for _, degree in G.degree()), dtype=np.int64, count=len(nodes)
+    )
+    
+    # Color by node type: blue for patients, orange for providers
+    node_color = np.where(is_patient, '#1f77b4', '#ff7f0e').tolist()
+    
+    # Size by degree (number of connections)
+    node_size = 10 + node_degree * 2 * node_size_scale
+    
+    # Hover text with connection count
+    node_text = [
+        f"{node}<br>Connections: {degree}"
+        for node, degree in zip(nodes, node_degree.tolist())
+    ]
+    
+    # Create node trace; text labels are drawn outside WebGL, so large
+    # graphs only get them on hover
+    show_labels = len(nodes) <= MAX_LABELED_NODES
+    node_trace = go.Scattergl(
+        x=node_xy[:, 0],
+        y=node_xy[:, 1],
+        mode='markers+text' if show_labels else 'markers',
+        text=[node.split('_')[0] + '<br>' + node.split('_')[1] for node in nodes] if show_labels else None,
         textposition='top center',
         hoverinfo='text',
         hovertext=node_text,
@@ -156,19 +273,23 @@ def create_network_visualization(
             xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
             yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
             plot_bgcolor='white',
-            height=700
+            height=700,
+            uirevision='net'  # Keep zoom/pan across Streamlit reruns
         )
     )
     
     return fig
 
 
-def get_network_statistics(G: nx.Graph) -> Dict:
+def get_network_statistics(G: nx.Graph, engine: str = 'networkx') -> Dict:
     """
     Calculate network statistics.
     
     Args:
         G: NetworkX Graph object
+        engine: 'networkx', or 'igraph' to count connected components with
+            igraph's C implementation when python-igraph is installed
+            (falls back to networkx otherwise)
         
     Returns:
         Dictionary of network statistics
@@ -186,35 +307,203 @@ def get_network_statistics(G: nx.Graph) -> Dict:
             'is_connected': False,
         }
     
+    converted = _to_igraph(G) if engine == 'igraph' else None
+    if converted is not None:
+        num_components = len(converted[1].connected_components())
+    else:
+        num_components = nx.number_connected_components(G)
+    
     return {
         'num_nodes': num_nodes,
         'num_edges': G.number_of_edges(),
-        'avg_degree': sum(dict(G.degree()).values()) / num_nodes,
+        'avg_degree': 2 * G.number_of_edges() / num_nodes,  # Degree sum
         'density': nx.density(G),
-        'num_connected_components': nx.number_connected_components(G),
-        'is_connected': nx.is_connected(G),
+        'num_connected_components': num_components,
+        'is_connected': num_components == 1,
     }
 
 
-def detect_suspicious_clusters(G: nx.Graph, min_cluster_size: int = 3) -> Dict:
+def detect_suspicious_clusters(
+    G: nx.Graph,
+    min_cluster_size: int = 3,
+    min_shared_patients: int = 2,
+    engine: str = 'networkx',
+    min_provider_patients: int = 3,
+    min_jaccard: float = 0.5
+) -> Dict:
     """
     Detect potentially suspicious patient-provider clusters.
     
+    On a patient-provider graph every maximal clique is a single edge, so
+    clusters are found instead as pairs of providers sharing a group of
+    patients (provider pair + shared patients). A pair is only suspicious
+    when both providers have at least min_provider_patients patients and
+    their patient sets overlap by at least min_jaccard (shared patients over
+    the union of both sets); ``total_cliques`` counts every provider pair
+    with a patient in common before that filter. Other graphs fall back to
+    maximal clique enumeration inside the (min_cluster_size - 1)-core, the
+    only part of the graph that can hold a clique of min_cluster_size, so
+    ``total_cliques`` counts the cliques found there. Each core component
+    contributes at most MAX_CLIQUES_PER_COMPONENT cliques.
+    
     Args:
         G: NetworkX Graph object
         min_cluster_size: Minimum size to consider as suspicious
+        min_shared_patients: Minimum patients a provider pair must share
+            to form a cluster (patient-provider graphs only)
+        engine: 'networkx', or 'igraph' to enumerate cliques with igraph's
+            C implementation when python-igraph is installed (falls back to
+            networkx otherwise)
+        min_provider_patients: Minimum patients each provider of a pair
+            must have (patient-provider graphs only)
+        min_jaccard: Minimum Jaccard similarity of the two providers'
+            patient sets (patient-provider graphs only)
         
     Returns:
         Dictionary with cluster information
     """
-    # Find cliques (fully connected subgraphs)
-    cliques = list(nx.find_cliques(G))
+    patients = {n for n, t in G.nodes(data='node_type') if t == 'patient'}
+    is_bipartite = all((u in patients) != (v in patients) for u, v in G.edges())
     
-    # Filter by size
-    suspicious_cliques = [c for c in cliques if len(c) >= min_cluster_size]
+    candidates = None
+    if patients and is_bipartite:
+        candidates, clusters = _shared_patient_clusters(
+            G, patients, min_shared_patients, min_provider_patients, min_jaccard
+        )
+    else:
+        # Find cliques (fully connected subgraphs), streamed from the
+        # generator rather than materialized: only sizes are needed for
+        # the counts, and only the first few large cliques are kept
+        clusters = _core_cliques(G, min_cluster_size, engine)
+    
+    # Count and filter by size in one pass
+    total = 0
+    suspicious = 0
+    clique_details = []
+    for cluster in clusters:
+        total += 1
+        if len(cluster) >= min_cluster_size:
+            suspicious += 1
+            if len(clique_details) < 10:
+                clique_details.append(cluster)
     
     return {
-        'total_cliques': len(cliques),
-        'suspicious_cliques': len(suspicious_cliques),
-        'clique_details': suspicious_cliques[:10]  # Top 10 for display
+        # Shared-patient search: every candidate pair, flagged or not
+        'total_cliques': total if candidates is None else candidates,
+        'suspicious_cliques': suspicious,
+        'clique_details': clique_details  # Top 10 for display
     }
+
+
+def _core_cliques(G: nx.Graph, min_cluster_size: int, engine: str):
+    """
+    Yield maximal cliques of the k-core, one connected component at a time.
+    
+    Args:
+        G: NetworkX Graph object
+        min_cluster_size: Clique size of interest; sets k to one less
+        engine: 'networkx' or 'igraph' (see detect_suspicious_clusters)
+        
+    Yields:
+        Maximal cliques as lists of node names
+    """
+    if nx.number_of_selfloops(G):
+        # k_core rejects self-loops, which never change a clique anyway
+        G = G.copy()
+        G.remove_edges_from(list(nx.selfloop_edges(G)))
+    core = nx.k_core(G, k=max(min_cluster_size - 1, 0))
+    
+    for component in nx.connected_components(core):
+        sub = core.subgraph(component)
+        cliques = _igraph_cliques(sub) if engine == 'igraph' else None
+        if cliques is None:
+            cliques = nx.find_cliques(sub)
+        yield from islice(cliques, MAX_CLIQUES_PER_COMPONENT)
+
+
+def _igraph_cliques(G: nx.Graph) -> Optional[List[List]]:
+    """
+    Enumerate maximal cliques with python-igraph, if it is installed.
+    
+    Args:
+        G: NetworkX Graph object
+        
+    Returns:
+        Maximal cliques as lists of node names, or None without igraph
+    """
+    converted = _to_igraph(G)
+    if converted is None:
+        return None
+    _, ig, nodes = converted
+    return [[nodes[i] for i in clique] for clique in ig.maximal_cliques()]
+
+
+def _to_igraph(G: nx.Graph) -> Optional[Tuple]:
+    """
+    Convert a NetworkX graph to python-igraph, if it is installed.
+    
+    Args:
+        G: NetworkX Graph object
+        
+    Returns:
+        Tuple of (igraph module, igraph Graph, node names by vertex index),
+        or None without igraph
+    """
+    try:
+        import igraph
+    except ImportError:
+        return None
+    
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    ig = igraph.Graph(
+        n=len(nodes),
+        edges=[(index[u], index[v]) for u, v in G.edges() if u != v]
+    )
+    return igraph, ig, nodes
+
+
+def _shared_patient_clusters(
+    G: nx.Graph,
+    patients: set,
+    min_shared_patients: int,
+    min_provider_patients: int,
+    min_jaccard: float
+) -> Tuple[int, List[List[str]]]:
+    """
+    Group patients by the provider pairs they were both billed by.
+    
+    Walks each patient's provider list once (an inverted index), so the cost
+    is the sum of C(deg(patient), 2) over patients rather than exponential
+    like clique enumeration.
+    
+    Args:
+        G: Bipartite patient-provider graph
+        patients: Set of patient node names
+        min_shared_patients: Minimum shared patients per provider pair
+        min_provider_patients: Minimum patients each provider must have
+        min_jaccard: Minimum Jaccard similarity of the providers' patient sets
+        
+    Returns:
+        Tuple of (number of provider pairs sharing any patient, clusters as
+        node lists (two providers, then shared patients), largest first)
+    """
+    shared = defaultdict(set)
+    for patient in (n for n in G if n in patients):
+        providers = sorted(G.neighbors(patient))
+        for pair in combinations(providers, 2):
+            shared[pair].add(patient)
+    
+    # A provider's degree is the size of its patient set
+    degree = G.degree
+    clusters = []
+    for (a, b), members in shared.items():
+        if len(members) < min_shared_patients:
+            continue
+        if min(degree[a], degree[b]) < min_provider_patients:
+            continue
+        if len(members) / (degree[a] + degree[b] - len(members)) < min_jaccard:
+            continue
+        clusters.append([a, b] + sorted(members))
+    clusters.sort(key=len, reverse=True)
+    return len(shared), clusters